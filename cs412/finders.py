@@ -0,0 +1,36 @@
+"""
+Static files finder for the Plotly.js bundle of the installed plotly package.
+
+It serves the one file the chart pages need, plotly/plotly.min.js, so the
+bundle always matches the plotly version rendering the figures. The rest of
+the package data (the widget bundle, datasets and templates) stays out of
+the static files.
+"""
+
+import os
+
+import plotly
+from django.contrib.staticfiles.finders import BaseFinder
+from django.core.files.storage import FileSystemStorage
+
+
+class PlotlyFinder(BaseFinder):
+    prefix = 'plotly'
+    filename = 'plotly.min.js'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.storage = FileSystemStorage(
+            location=os.path.join(os.path.dirname(plotly.__file__), 'package_data')
+        )
+        # collectstatic copies the file to <prefix>/<filename>
+        self.storage.prefix = self.prefix
+
+    def find(self, path, find_all=False, **kwargs):
+        if path == f'{self.prefix}/{self.filename}':
+            match = self.storage.path(self.filename)
+            return [match] if find_all else match
+        return [] if find_all else None
+
+    def list(self, ignore_patterns):
+        yield self.filename, self.storage
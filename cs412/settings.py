@@ -134,6 +134,13 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')  # Directory where collectst
 STATICFILES_DIRS = [
     os.path.join(BASE_DIR, "static"),  # Additional locations of static files
 ]
+STATICFILES_FINDERS = [
+    'django.contrib.staticfiles.finders.FileSystemFinder',
+    'django.contrib.staticfiles.finders.AppDirectoriesFinder',
+    # Only plotly.min.js from the installed plotly package, served as
+    # plotly/plotly.min.js so chart pages load it once instead of inlining it
+    'cs412.finders.PlotlyFinder',
+]
 
 # Media files (User-uploaded content)
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media/')
@@ -173,6 +180,40 @@ MESSAGE_TAGS = {
     message_constants.ERROR: 'danger',
 }
 
+# Voter Analytics: answer list and graph filters from a NumPy copy of the
+# Voter table instead of SQLite. load_data saves it as memory-mapped files
+# under VOTER_ANALYTICS_SNAPSHOT_DIR, which every worker maps and shares.
+VOTER_ANALYTICS_SNAPSHOT = False
+VOTER_ANALYTICS_SNAPSHOT_DIR = BASE_DIR / 'voter_analytics' / 'data' / 'snapshots'
+
+# Voter Analytics: rendered charts and list counts kept per filter combination
+# (least recently used entries are dropped beyond this). Cleared by load_data.
+VOTER_ANALYTICS_RESULT_CACHE_SIZE = 128
+
+# Voter Analytics: charts computed at once in the background when a graphs or
+# compare page is rendered, so they are ready when the browser asks for them.
+# 0 computes each chart only when it is requested.
+VOTER_ANALYTICS_CHART_WORKERS = 3
+
+# Gym: the most points drawn on the home page scatter plot (a stratified sample
+# per gender beyond this), and the number of members above which it is drawn
+# as a density heatmap instead. None always draws the scatter plot.
+GYM_SCATTER_POINTS = 5000
+GYM_SCATTER_HEATMAP_ROWS = 100000
+
+# Gym: home page charts kept per filter combination (least recently used ones
+# are dropped beyond this), and the threads that compute them ahead of their
+# requests and refresh them after load_member_data_from_csv. Until a refresh
+# finishes the previous chart is served. 0 threads computes them in requests.
+GYM_FIGURE_CACHE_SIZE = 64
+GYM_FIGURE_CACHE_WORKERS = 2
+
+# Gym: seconds to wait for more workout sessions or fitness metrics of a
+# profile before regenerating its suggestions in the background, and the
+# longest a profile that keeps changing waits.
+GYM_SUGGESTION_DELAY = 1.0
+GYM_SUGGESTION_MAX_DELAY = 10.0
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
@@ -0,0 +1,190 @@
+# gym_app/cache.py
+# Author: Haocheng Liu <easonlhc@bu.edu>
+# Description: This file caches the member data charts of the home page per filter combination,
+#              until load_member_data_from_csv bumps the MemberDataVersion.
+
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from django.conf import settings
+from django.db import connection
+from .models import MemberDataVersion
+
+logger = logging.getLogger(__name__)
+
+# Entries kept and background threads used when the GYM_FIGURE_CACHE_* settings are not set.
+DEFAULT_CACHE_SIZE = 64
+DEFAULT_CACHE_WORKERS = 2
+
+
+class FigureCache:
+    """
+    In-process LRU cache of values computed from the member data, such as chart JSON.
+
+    Each entry remembers the MemberDataVersion it was computed for. After a new load, an
+    entry is still served as it is (stale) while one background thread recomputes it, so
+    only a filter that was never cached makes a request wait. A key is only ever computed
+    by one thread at a time: other requests for it wait for that result instead of
+    computing it again.
+
+    Each gunicorn worker has its own cache, so the counters are per process.
+    """
+
+    def __init__(self, max_entries, workers):
+        # Most entries kept; the least recently used ones are dropped beyond this.
+        self.max_entries = max_entries
+        # Threads refreshing stale entries and warming charts (0 computes them in the request).
+        self.workers = workers
+        self.executor = None
+        # (version, value) by key, least recently used first.
+        self.entries = OrderedDict()
+        # Futures of the values being computed right now, by (key, version).
+        self.pending = {}
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.waits = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, key, compute):
+        """
+        Returns the cached value for key, calling compute() and storing its result on a miss,
+        or waiting for the thread already computing it. A stale value is returned right away
+        and refreshed in the background.
+        """
+        version = MemberDataVersion.current()
+
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                if entry[0] == version:
+                    self.hits += 1
+                    return entry[1]
+                # Stale: serve it, and start a refresh unless one is running.
+                self.stale_hits += 1
+                refresh = self.start(key, version)
+            else:
+                refresh = None
+                pending = self.pending.get((key, version))
+                if pending is None:
+                    self.misses += 1
+                    pending = self.start(key, version)
+                    owner = True
+                else:
+                    self.waits += 1
+                    owner = False
+
+        if entry is not None:
+            if refresh is not None:
+                self.refresh(key, version, compute, refresh)
+            return entry[1]
+
+        if not owner:
+            # Raises whatever the computing thread's compute() raised.
+            return pending.result()
+        return self.compute(key, version, compute, pending)
+
+    def start(self, key, version):
+        """
+        Registers a computation of key for version and returns its Future, or None if one is
+        already running. Called with the lock held.
+        """
+        if (key, version) in self.pending:
+            return None
+        future = self.pending[(key, version)] = Future()
+        return future
+
+    def compute(self, key, version, compute, future):
+        """
+        Computes the value of key for version, stores it and resolves future with it.
+        """
+        try:
+            value = compute()
+        except BaseException as e:
+            with self.lock:
+                self.pending.pop((key, version), None)
+            future.set_exception(e)
+            raise
+
+        with self.lock:
+            self.pending.pop((key, version), None)
+            # Never replace a value computed for a newer version.
+            current = self.entries.get(key)
+            if current is None or current[0] <= version:
+                self.entries[key] = (version, value)
+                self.entries.move_to_end(key)
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+                    self.evictions += 1
+        future.set_result(value)
+        return value
+
+    def refresh(self, key, version, compute, future):
+        """
+        Refreshes a stale key in the background, or right away if there are no workers.
+        """
+        if not self.run_in_background(lambda: self.compute(key, version, compute, future)):
+            try:
+                self.compute(key, version, compute, future)
+            except Exception:
+                logger.exception('Refreshing a cached member chart failed')
+
+    def run_in_background(self, call):
+        """
+        Runs call on the background threads, started on first use, without waiting for it.
+        Returns False if the cache has no workers.
+        """
+        if not self.workers:
+            return False
+        with self.lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=self.workers,
+                                                   thread_name_prefix='member-charts')
+        self.executor.submit(_run_in_background, call)
+        return True
+
+    def clear(self):
+        """
+        Drops every entry, so the next requests compute their values again.
+        """
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        """
+        Counters for monitoring, as a JSON-friendly dict.
+        """
+        with self.lock:
+            lookups = self.hits + self.stale_hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'stale_hits': self.stale_hits,
+                'misses': self.misses,
+                'waits': self.waits,
+                'evictions': self.evictions,
+                'hit_rate': (self.hits + self.stale_hits) / lookups if lookups else None,
+            }
+
+
+def _run_in_background(call):
+    """
+    Runs call on a background thread, logging its errors instead of losing them.
+    """
+    try:
+        call()
+    except Exception:
+        logger.exception('Computing a cached member chart in the background failed')
+    finally:
+        # Each background thread has its own database connection; don't leave it open.
+        connection.close()
+
+
+figure_cache = FigureCache(
+    getattr(settings, 'GYM_FIGURE_CACHE_SIZE', DEFAULT_CACHE_SIZE),
+    getattr(settings, 'GYM_FIGURE_CACHE_WORKERS', DEFAULT_CACHE_WORKERS),
+)
@@ -0,0 +1,288 @@
+# gym_app/charts.py
+# Author: Haocheng Liu <easonlhc@bu.edu>
+# Description: This file builds the member data visualizations shown on the home page.
+#              Each chart is a function of the filtered member data queryset, served as Plotly figure JSON.
+#              Grouped charts aggregate in the database; only the scatter plot fetches rows.
+
+import numpy as np
+from functools import partial
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+from django.conf import settings
+from django.db.models import Avg, Case, CharField, Count, Value, When
+from .cache import figure_cache
+from .forms import DataFilterForm
+from .models import MemberData
+
+
+def member_filters(params):
+    """
+    Returns the DataFilterForm fields in params as a normalized dict of the filters that apply,
+    so equivalent queries ('All' or left out, padded numbers) compare and cache the same.
+    Invalid filters are ignored, the same way the home page always has.
+    """
+    filters = {}
+    form = DataFilterForm(params or None)
+
+    if form.is_valid():
+        gender = form.cleaned_data.get('gender')
+        min_age = form.cleaned_data.get('min_age')
+        max_age = form.cleaned_data.get('max_age')
+        experience_level = form.cleaned_data.get('experience_level')
+        workout_frequency = form.cleaned_data.get('workout_frequency')
+
+        if gender and gender != 'All':
+            filters['gender'] = gender
+
+        if min_age is not None:
+            filters['min_age'] = min_age
+
+        if max_age is not None:
+            filters['max_age'] = max_age
+
+        if experience_level and experience_level != 'All':
+            filters['experience_level'] = int(experience_level)
+
+        if workout_frequency in ('Low', 'High'):
+            filters['workout_frequency'] = workout_frequency
+
+    return filters
+
+
+def filters_key(filters):
+    """
+    Returns a hashable key of normalized member filters, for caching.
+    """
+    return tuple(sorted(filters.items()))
+
+
+def filter_member_data(filters):
+    """
+    Returns the MemberData queryset filtered with normalized member filters.
+    """
+    member_data_qs = MemberData.objects.all()
+
+    if 'gender' in filters:
+        member_data_qs = member_data_qs.filter(gender=filters['gender'])
+
+    if 'min_age' in filters:
+        member_data_qs = member_data_qs.filter(age__gte=filters['min_age'])
+
+    if 'max_age' in filters:
+        member_data_qs = member_data_qs.filter(age__lte=filters['max_age'])
+
+    if 'experience_level' in filters:
+        member_data_qs = member_data_qs.filter(experience_level=filters['experience_level'])
+
+    if filters.get('workout_frequency') == 'Low':
+        member_data_qs = member_data_qs.filter(workout_frequency__lte=2)
+    elif filters.get('workout_frequency') == 'High':
+        member_data_qs = member_data_qs.filter(workout_frequency__gte=3)
+
+    return member_data_qs
+
+
+# Age groups for chart 2 as (label, lower bound, upper bound), matching the bins pd.cut
+# used to apply: each group holds the ages above its lower bound, up to its upper bound.
+AGE_GROUPS = [
+    ('0-20', 0, 20),
+    ('21-30', 20, 30),
+    ('31-40', 30, 40),
+    ('41-50', 40, 50),
+    ('51-60', 50, 60),
+    ('60+', 60, 100),
+]
+
+# Most points drawn by the scatter plot, and the number of members above which it is
+# drawn as a density heatmap instead. Overridden by the GYM_SCATTER_* settings.
+DEFAULT_SCATTER_POINTS = 5000
+DEFAULT_SCATTER_HEATMAP_ROWS = 100000
+
+# BMI bins of the density heatmap; workout frequency gets one bin per day.
+HEATMAP_BMI_BINS = 40
+
+# Seed of the scatter sample, so the same data always gives the same chart.
+SCATTER_SEED = 0
+
+# Workout frequency groups for chart 4.
+LOW_FREQUENCY = '≤2 times/week'
+HIGH_FREQUENCY = '≥3 times/week'
+
+
+def member_dataframe(member_data_qs, *fields):
+    """
+    Converts the given MemberData fields of a queryset to a DataFrame for Plotly.
+    Only the named columns are fetched, so the cost does not grow with the row width.
+    """
+    return pd.DataFrame.from_records(list(member_data_qs.values_list(*fields)), columns=fields)
+
+
+def grouped_dataframe(member_data_qs, group, **aggregates):
+    """
+    Groups a MemberData queryset by the group annotation in the database and returns one
+    DataFrame row per group with the given aggregates, ordered by group.
+    """
+    rows = member_data_qs.values(group).annotate(**aggregates).order_by(group)
+    return pd.DataFrame.from_records(list(rows), columns=[group, *aggregates])
+
+
+def stratified_sample(groups, budget, seed=SCATTER_SEED):
+    """
+    Returns the sorted indices of about budget rows, drawn from each value of the groups
+    array in proportion to its size (at least one row per group), so small groups stay
+    visible. The draw is deterministic for a given seed.
+    """
+    codes = pd.factorize(groups)[0]
+    sizes = np.bincount(codes)
+    quotas = np.maximum(sizes * budget // len(codes), 1)
+
+    # Shuffle with random keys, sort by group, and keep each group's first quota rows.
+    order = np.lexsort((np.random.default_rng(seed).random(len(codes)), codes))
+    starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+    rank = np.arange(len(order)) - starts[codes[order]]
+    return np.sort(order[rank < quotas[codes[order]]])
+
+
+def bmi_frequency_heatmap(df):
+    """
+    Bins the members of each gender by BMI and workout frequency and draws the counts as
+    one density heatmap per gender, side by side.
+    """
+    codes, genders = pd.factorize(df['gender'], sort=True)
+    bmi = df['bmi'].to_numpy()
+    frequency = df['workout_frequency'].to_numpy()
+    bmi_edges = np.histogram_bin_edges(bmi, bins=HEATMAP_BMI_BINS)
+    frequencies = np.arange(frequency.min(), frequency.max() + 1)
+    frequency_edges = np.append(frequencies, frequencies[-1] + 1) - 0.5
+
+    figure = make_subplots(rows=1, cols=len(genders), shared_yaxes=True, subplot_titles=list(genders))
+    for column, gender in enumerate(genders, start=1):
+        members = codes == column - 1
+        counts = np.histogram2d(frequency[members], bmi[members], bins=(frequency_edges, bmi_edges))[0]
+        figure.add_trace(go.Heatmap(x=(bmi_edges[:-1] + bmi_edges[1:]) / 2, y=frequencies, z=counts,
+                                    coloraxis='coloraxis', name=gender), row=1, col=column)
+        figure.update_xaxes(title_text='BMI', row=1, col=column)
+    figure.update_yaxes(title_text='Workout Frequency (days/week)', row=1, col=1)
+    figure.update_layout(title='Workout Frequency vs BMI by Gender',
+                         coloraxis={'colorbar': {'title': 'Members'}})
+    return figure
+
+
+def bmi_frequency_figure(member_data_qs):
+    """
+    Chart 1: Scatter plot showing relationship between BMI and Workout Frequency by Gender.
+    Large member sets are drawn from a stratified sample per gender, and beyond
+    GYM_SCATTER_HEATMAP_ROWS as a density heatmap, so the chart size stays bounded.
+    """
+    df = member_dataframe(member_data_qs, 'bmi', 'workout_frequency', 'gender')
+    heatmap_rows = getattr(settings, 'GYM_SCATTER_HEATMAP_ROWS', DEFAULT_SCATTER_HEATMAP_ROWS)
+    if heatmap_rows is not None and len(df) > heatmap_rows:
+        return bmi_frequency_heatmap(df)
+
+    budget = getattr(settings, 'GYM_SCATTER_POINTS', DEFAULT_SCATTER_POINTS)
+    title = 'Workout Frequency vs BMI by Gender'
+    if len(df) > budget:
+        df = df.iloc[stratified_sample(df['gender'].to_numpy(), budget)]
+        title += f' (sample of {len(df):,} members)'
+    return px.scatter(df, x='bmi', y='workout_frequency', color='gender',
+                      title=title,
+                      labels={'bmi': 'BMI', 'workout_frequency': 'Workout Frequency (days/week)'})
+
+
+def bmi_by_age_figure(member_data_qs):
+    """
+    Chart 2: Bar chart showing average BMI by age group.
+    """
+    # Bucket ages in the database; ages outside every group are left out, as pd.cut did.
+    age_group = Case(
+        *(When(age__gt=low, age__lte=high, then=Value(label)) for label, low, high in AGE_GROUPS),
+        default=None,
+        output_field=CharField(),
+    )
+    member_data_qs = member_data_qs.annotate(age_group=age_group).exclude(age_group=None)
+    avg_bmi_age = grouped_dataframe(member_data_qs, 'age_group', bmi=Avg('bmi'))
+    return px.bar(avg_bmi_age, x='age_group', y='bmi', color='age_group',
+                  title='Average BMI by Age Group',
+                  labels={'age_group': 'Age Group', 'bmi': 'Average BMI'},
+                  text_auto=True)
+
+
+def workout_types_figure(member_data_qs):
+    """
+    Chart 3: Pie chart showing distribution of workout types.
+    """
+    workout_type_counts = pd.DataFrame.from_records(
+        list(member_data_qs.values('workout_type').annotate(count=Count('pk')).order_by('-count')),
+        columns=['workout_type', 'count'],
+    )
+    return px.pie(workout_type_counts, names='workout_type', values='count',
+                  title='Distribution of Workout Types',
+                  color_discrete_sequence=px.colors.qualitative.Pastel)
+
+
+def bmi_by_frequency_figure(member_data_qs):
+    """
+    Chart 4: Bar chart comparing average BMI for different workout frequency groups.
+    """
+    frequency_group = Case(
+        When(workout_frequency__lte=2, then=Value(LOW_FREQUENCY)),
+        default=Value(HIGH_FREQUENCY),
+        output_field=CharField(),
+    )
+    member_data_qs = member_data_qs.annotate(frequency_group=frequency_group)
+    avg_bmi_by_frequency = grouped_dataframe(member_data_qs, 'frequency_group', bmi=Avg('bmi'))
+    return px.bar(avg_bmi_by_frequency, x='frequency_group', y='bmi', color='frequency_group',
+                  title='Average BMI by Workout Frequency',
+                  labels={'frequency_group': 'Workout Frequency Group', 'bmi': 'Average BMI'},
+                  text_auto=True,
+                  color_discrete_sequence=px.colors.qualitative.Set2)
+
+
+def calories_by_gender_figure(member_data_qs):
+    """
+    Chart 5: Bar chart showing average calories burned by gender.
+    """
+    avg_calories_by_gender = grouped_dataframe(member_data_qs, 'gender', calories_burned=Avg('calories_burned'))
+    return px.bar(avg_calories_by_gender, x='gender', y='calories_burned', color='gender',
+                  title='Average Calories Burned by Gender',
+                  labels={'gender': 'Gender', 'calories_burned': 'Average Calories Burned'},
+                  text_auto=True,
+                  color_discrete_sequence=px.colors.qualitative.Set1)
+
+
+# Charts served by MemberChartView, in the order they appear on the home page.
+CHARTS = {
+    'bmi-frequency': bmi_frequency_figure,
+    'bmi-by-age': bmi_by_age_figure,
+    'workout-types': workout_types_figure,
+    'bmi-by-frequency': bmi_by_frequency_figure,
+    'calories-by-gender': calories_by_gender_figure,
+}
+
+
+def has_member_data(filters):
+    """
+    Returns whether any member matches the filters, cached until the next load.
+    """
+    return figure_cache.get(('exists', filters_key(filters)),
+                            lambda: filter_member_data(filters).exists())
+
+
+def chart_json(name, filters):
+    """
+    Returns the Plotly figure JSON of one chart for the filters, cached until the next load.
+    """
+    return figure_cache.get((name, filters_key(filters)),
+                            lambda: CHARTS[name](filter_member_data(filters)).to_json())
+
+
+def prepare_charts(filters):
+    """
+    Starts computing every chart for the filters in the background, without waiting for them.
+    The home page calls this once it is rendered, so the chart requests that follow find the
+    charts cached, or wait for the one computation in progress.
+    """
+    for name in CHARTS:
+        figure_cache.run_in_background(partial(chart_json, name, filters))
@@ -0,0 +1,21 @@
+# gym_app/management/commands/load_member_data.py
+# Author: Haocheng Liu <easonlhc@bu.edu>
+# Description: Management command that loads the member data CSV used by the analytics charts.
+
+from django.core.management.base import BaseCommand
+from gym_app.models import MEMBER_DATA_CSV, MEMBER_DATA_CHUNK_SIZE, load_member_data_from_csv
+
+
+class Command(BaseCommand):
+    help = 'Replace the MemberData table with the rows of a member data CSV file.'
+
+    def add_arguments(self, parser):
+        # The bundled gym_members_exercise_tracking.csv is loaded when no file is given.
+        parser.add_argument('filename', nargs='?', default=MEMBER_DATA_CSV,
+                            help='CSV file to load (default: the bundled member data).')
+        parser.add_argument('--chunk-size', type=int, default=MEMBER_DATA_CHUNK_SIZE,
+                            help='Rows parsed and inserted per chunk.')
+
+    def handle(self, *args, **options):
+        # The loader prints its own summary of loaded and rejected rows.
+        load_member_data_from_csv(options['filename'], chunk_size=options['chunk_size'])
@@ -3,11 +3,14 @@
 # Description: This file defines the Django models for profiles, workout types, workout sessions,
 #              fitness metrics, suggestions, member data for analytics, friendships, and messaging.
 
-from django.db import models
+from django.db import models, transaction, connection
 from django.contrib.auth.models import User
 from django.urls import reverse
-import csv
+from collections import Counter
 import os
+import time
+import numpy as np
+import pandas as pd
 from django.conf import settings
 
 class Profile(models.Model):
@@ -296,46 +299,174 @@ class MemberData(models.Model):
         return f'{self.gender} aged {self.age}'
 
 
-def load_member_data_from_csv():
+class MemberDataVersion(models.Model):
     """
-    Loads member data from a CSV file into the MemberData model.
-    This function reads a CSV file located in the gym_app/data directory and populates the MemberData table.
-    It first clears existing data to avoid duplication.
+    Single-row counter bumped every time load_member_data_from_csv replaces the member data.
+    The cached member charts compare against it to detect stale figures, in every worker process.
     """
-    # First, delete existing records to avoid duplication.
-    MemberData.objects.all().delete()
-
-    # Construct the path to the CSV file.
-    data_file = os.path.join(settings.BASE_DIR, 'gym_app', 'data', 'gym_members_exercise_tracking.csv')
-
-    # Open and read the CSV file.
-    with open(data_file, newline='') as csvfile:
-        reader = csv.DictReader(csvfile)
-        for row in reader:
-            try:
-                # Create a new MemberData instance with data from the CSV row.
-                member_data = MemberData(
-                    age=int(row['Age']),
-                    gender=row['Gender'],
-                    weight_kg=float(row['Weight (kg)']),
-                    height_m=float(row['Height (m)']),
-                    max_bpm=int(row['Max_BPM']),
-                    avg_bpm=int(row['Avg_BPM']),
-                    resting_bpm=int(row['Resting_BPM']),
-                    session_duration_hours=float(row['Session_Duration (hours)']),
-                    calories_burned=float(row['Calories_Burned']),
-                    workout_type=row['Workout_Type'],
-                    fat_percentage=float(row['Fat_Percentage']),
-                    water_intake_liters=float(row['Water_Intake (liters)']),
-                    workout_frequency=int(row['Workout_Frequency (days/week)']),
-                    experience_level=int(row['Experience_Level']),
-                    bmi=float(row['BMI']),
-                )
-                member_data.save()  # Save the instance to the database.
-            except Exception as e:
-                # Print error message for any row that fails to process.
-                print(f"Error processing row: {row}")
-                print(e)
+    # Number of times the member data has been loaded.
+    version = models.PositiveIntegerField(default=0)
+    # When the member data was last loaded.
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        """
+        Returns a string representation of the member data version.
+        """
+        return f'Member data version {self.version}'
+
+    @classmethod
+    def current(cls):
+        """
+        Returns the current member data version (0 if the data was never loaded).
+        """
+        return cls.objects.filter(pk=1).values_list('version', flat=True).first() or 0
+
+    @classmethod
+    def bump(cls):
+        """
+        Marks the member data as changed.
+        """
+        cls.objects.get_or_create(pk=1)
+        cls.objects.filter(pk=1).update(version=models.F('version') + 1)
+
+
+# Default location of the member data CSV file.
+MEMBER_DATA_CSV = os.path.join(settings.BASE_DIR, 'gym_app', 'data', 'gym_members_exercise_tracking.csv')
+
+# CSV column for each MemberData field, and whether the field holds whole numbers,
+# decimals or text.
+MEMBER_DATA_COLUMNS = {
+    'age': ('Age', 'int'),
+    'gender': ('Gender', 'text'),
+    'weight_kg': ('Weight (kg)', 'float'),
+    'height_m': ('Height (m)', 'float'),
+    'max_bpm': ('Max_BPM', 'int'),
+    'avg_bpm': ('Avg_BPM', 'int'),
+    'resting_bpm': ('Resting_BPM', 'int'),
+    'session_duration_hours': ('Session_Duration (hours)', 'float'),
+    'calories_burned': ('Calories_Burned', 'float'),
+    'workout_type': ('Workout_Type', 'text'),
+    'fat_percentage': ('Fat_Percentage', 'float'),
+    'water_intake_liters': ('Water_Intake (liters)', 'float'),
+    'workout_frequency': ('Workout_Frequency (days/week)', 'int'),
+    'experience_level': ('Experience_Level', 'int'),
+    'bmi': ('BMI', 'float'),
+}
+
+# Rows parsed per pandas chunk, and rows per INSERT statement.
+MEMBER_DATA_CHUNK_SIZE = 50000
+MEMBER_DATA_BATCH_SIZE = 2000
+
+# Rejected rows listed individually in the summary; the rest are only counted.
+REJECTED_ROWS_SHOWN = 10
+
+
+def parse_member_data_chunk(chunk):
+    """
+    Validates and converts one pandas chunk of CSV rows (read as strings) column by column.
+    Returns a DataFrame of the valid rows with one column per MemberData field, and a list of
+    (CSV line number, reason) for each rejected row.
+    """
+    parsed = pd.DataFrame(index=chunk.index)
+    reasons = pd.Series('', index=chunk.index)
+
+    for field, (column, kind) in MEMBER_DATA_COLUMNS.items():
+        values = chunk[column].str.strip()
+        if kind == 'text':
+            max_length = MemberData._meta.get_field(field).max_length
+            invalid = values.isna() | (values == '') | (values.str.len() > max_length)
+        else:
+            values = pd.to_numeric(values, errors='coerce').astype('float64')
+            # NaN (not a number) and infinities can't be stored or charted.
+            invalid = ~np.isfinite(values)
+            if kind == 'int':
+                # Whole numbers only, within the range the database column holds.
+                low, high = connection.ops.integer_field_range(
+                    MemberData._meta.get_field(field).get_internal_type())
+                invalid |= (values != values.round()) | (values < low) | (values >= float(high) + 1)
+        # Keep only the first problem found in each row.
+        reasons = reasons.mask(invalid & (reasons == ''), f'invalid {column}')
+        parsed[field] = values
+
+    rejected = reasons != ''
+    valid = parsed[~rejected].astype({
+        field: 'int64' for field, (column, kind) in MEMBER_DATA_COLUMNS.items() if kind == 'int'
+    })
+    # pandas numbers rows from 0 across chunks; the header is line 1 of the file.
+    rejected_rows = [(int(row) + 2, reason) for row, reason in reasons[rejected].items()]
+    return valid, rejected_rows
+
+
+def load_member_data_from_csv(filename=MEMBER_DATA_CSV, chunk_size=MEMBER_DATA_CHUNK_SIZE,
+                              batch_size=MEMBER_DATA_BATCH_SIZE):
+    """
+    Loads member data from a CSV file into the MemberData model, replacing the existing rows.
+
+    The file is read with pandas in chunks of chunk_size rows, each column is converted and
+    validated in one vectorized step, and the valid rows are inserted with executemany. Everything
+    runs in one transaction, so the charts keep showing the previous data until the new data is
+    complete, and a failed load leaves it untouched. Rejected rows are reported in the summary
+    instead of one by one.
+
+    Returns a summary dict with the number of rows loaded and rejected, the rejections per reason,
+    and the first few rejected rows as (line number, reason).
+    """
+    start = time.perf_counter()
+    columns = [column for column, kind in MEMBER_DATA_COLUMNS.values()]
+
+    # Check the header before touching the table.
+    header = pd.read_csv(filename, nrows=0).columns
+    missing = [column for column in columns if column not in header]
+    if missing:
+        raise ValueError(f'{filename} is missing the columns: {", ".join(missing)}')
+
+    # The rows were validated above, so they are inserted directly instead of through bulk_create.
+    fields = list(MEMBER_DATA_COLUMNS)
+    quote = connection.ops.quote_name
+    insert_sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+        quote(MemberData._meta.db_table),
+        ', '.join(quote(MemberData._meta.get_field(field).column) for field in fields),
+        ', '.join(['%s'] * len(fields)),
+    )
+
+    loaded = 0
+    rejected_rows = []
+    reasons = Counter()
+    with transaction.atomic():
+        # First, delete existing records to avoid duplication.
+        MemberData.objects.all().delete()
+
+        chunks = pd.read_csv(filename, usecols=columns, dtype=str, keep_default_na=False,
+                             chunksize=chunk_size)
+        for chunk in chunks:
+            valid, rejected = parse_member_data_chunk(chunk)
+
+            # Hand whole columns to the driver; building model instances costs more than the insert.
+            rows = list(zip(*(valid[field].tolist() for field in fields)))
+            with connection.cursor() as cursor:
+                for offset in range(0, len(rows), batch_size):
+                    cursor.executemany(insert_sql, rows[offset:offset + batch_size])
+            loaded += len(valid)
+            reasons.update(reason for line, reason in rejected)
+            rejected_rows.extend(rejected[:REJECTED_ROWS_SHOWN - len(rejected_rows)])
+
+        # Let the cached member charts know the data changed.
+        MemberDataVersion.bump()
+
+    summary = {
+        'loaded': loaded,
+        'rejected': sum(reasons.values()),
+        'rejected_reasons': dict(reasons),
+        'rejected_rows': rejected_rows,
+    }
+    elapsed = time.perf_counter() - start
+    print(f"Loaded {loaded} member data rows in {elapsed:.1f}s, rejected {summary['rejected']}.")
+    for reason, count in reasons.most_common():
+        print(f'  {count} rows with {reason}')
+    for line, reason in rejected_rows:
+        print(f'  line {line}: {reason}')
+    return summary
 
 
 class Friend(models.Model):
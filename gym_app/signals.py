@@ -1,43 +1,24 @@
 # gym_app/signals.py
 # Author: Haocheng Liu <easonlhc@bu.edu>
-# Description: This file contains signal handlers that generate suggestions based on workout sessions and fitness metrics.
+# Description: This file contains signal handlers that regenerate suggestions based on workout sessions and fitness metrics.
 
 
+from django.db import transaction
 from django.db.models.signals import post_save
 from django.dispatch import receiver
-from .models import WorkoutSession, FitnessMetric, Suggestion
-from .utils import generate_suggestions
+from .models import WorkoutSession, FitnessMetric
+from .suggestions import suggestion_queue
 
 @receiver(post_save, sender=WorkoutSession)
 def create_suggestions_on_workout_session(sender, instance, created, **kwargs):
     if created:
-        profile = instance.profile
-        # Delete existing suggestions
-        Suggestion.objects.filter(profile=profile).delete()
-        # Generate new suggestions
-        suggestions = generate_suggestions(profile)
-        # Create new suggestion instances
-        for sug in suggestions:
-            Suggestion.objects.create(
-                profile=profile,
-                suggestion_type=sug['type'],
-                suggestion_text=sug['text'],
-                title=sug['title']
-            )
+        profile_id = instance.profile_id
+        # Regenerate suggestions in the background once the new session is committed
+        transaction.on_commit(lambda: suggestion_queue.schedule(profile_id))
 
 @receiver(post_save, sender=FitnessMetric)
 def create_suggestions_on_fitness_metric(sender, instance, created, **kwargs):
     if created:
-        profile = instance.profile
-        # Delete existing suggestions
-        Suggestion.objects.filter(profile=profile).delete()
-        # Generate new suggestions
-        suggestions = generate_suggestions(profile)
-        # Create new suggestion instances
-        for sug in suggestions:
-            Suggestion.objects.create(
-                profile=profile,
-                suggestion_type=sug['type'],
-                suggestion_text=sug['text'],
-                title=sug['title']
-            )
+        profile_id = instance.profile_id
+        # Regenerate suggestions in the background once the new metric is committed
+        transaction.on_commit(lambda: suggestion_queue.schedule(profile_id))
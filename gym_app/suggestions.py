@@ -0,0 +1,134 @@
+# gym_app/suggestions.py
+# Author: Haocheng Liu <easonlhc@bu.edu>
+# Description: This file regenerates each profile's suggestions on a background thread, once per
+#              burst of new workout sessions and fitness metrics instead of once per record.
+
+import atexit
+import logging
+import threading
+import time
+from django.conf import settings
+from django.db import connection, transaction
+from .models import Profile, Suggestion
+from .utils import generate_suggestions
+
+logger = logging.getLogger(__name__)
+
+# Seconds to wait for more changes to a profile before regenerating its suggestions, and the
+# longest a profile that keeps changing waits, when the GYM_SUGGESTION_* settings are not set.
+DEFAULT_SUGGESTION_DELAY = 1.0
+DEFAULT_SUGGESTION_MAX_DELAY = 10.0
+
+
+def regenerate_suggestions(profile_id):
+    """
+    Replaces the suggestions of a profile with freshly generated ones, in one transaction.
+    Does nothing if the profile was deleted in the meantime.
+    """
+    profile = Profile.objects.filter(pk=profile_id).first()
+    if profile is None:
+        return
+
+    # Generate new suggestions before touching the old ones.
+    suggestions = [
+        Suggestion(
+            profile=profile,
+            suggestion_type=sug['type'],
+            suggestion_text=sug['text'],
+            title=sug['title'],
+        )
+        for sug in generate_suggestions(profile)
+    ]
+    with transaction.atomic():
+        # Delete existing suggestions and insert the new ones together.
+        Suggestion.objects.filter(profile=profile).delete()
+        Suggestion.objects.bulk_create(suggestions)
+
+
+class SuggestionQueue:
+    """
+    In-process queue of profiles whose suggestions need regenerating.
+
+    Scheduling a profile that is already queued only pushes its deadline back by delay
+    seconds (up to max_delay after it was first queued), so a burst of saves regenerates
+    its suggestions once. A single daemon thread, started on first use, regenerates the
+    profiles as they come due, so the requests that saved the records don't wait for it.
+
+    Each gunicorn worker has its own queue; a profile changed in two workers at once is
+    regenerated by both, which leaves the same suggestions.
+    """
+
+    def __init__(self, delay, max_delay):
+        # Seconds to wait for more changes, and the longest a profile waits.
+        self.delay = delay
+        self.max_delay = max_delay
+        # (first queued, due) times by profile id.
+        self.queued = {}
+        self.thread = None
+        self.condition = threading.Condition()
+
+    def schedule(self, profile_id):
+        """
+        Queues the profile's suggestions to be regenerated after the next quiet delay seconds.
+        """
+        now = time.monotonic()
+        with self.condition:
+            first = self.queued.get(profile_id, (now, None))[0]
+            self.queued[profile_id] = (first, min(now + self.delay, first + self.max_delay))
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name='gym-suggestions', daemon=True)
+                self.thread.start()
+                # The daemon thread dies with the process; don't lose what is still queued.
+                atexit.register(self.flush)
+            self.condition.notify()
+
+    def take_due(self, now):
+        """
+        Removes and returns the ids of the profiles due by now. Called with the lock held.
+        """
+        due = [profile_id for profile_id, (first, at) in self.queued.items() if at <= now]
+        for profile_id in due:
+            del self.queued[profile_id]
+        return due
+
+    def run(self):
+        """
+        Regenerates queued profiles as they come due, forever.
+        """
+        while True:
+            with self.condition:
+                while True:
+                    now = time.monotonic()
+                    due = self.take_due(now)
+                    if due:
+                        break
+                    # Sleep until the next profile is due, or until one is queued.
+                    next_due = min((at for first, at in self.queued.values()), default=None)
+                    self.condition.wait(None if next_due is None else next_due - now)
+            self.regenerate(due)
+
+    def flush(self):
+        """
+        Regenerates every queued profile right away in the calling thread. Registered
+        to run when the process exits, e.g. at the end of a management command or a
+        shell session that saved records.
+        """
+        with self.condition:
+            due = self.take_due(float('inf'))
+        self.regenerate(due)
+
+    def regenerate(self, profile_ids):
+        for profile_id in profile_ids:
+            try:
+                regenerate_suggestions(profile_id)
+            except Exception:
+                logger.exception('Regenerating suggestions for profile %s failed', profile_id)
+        if threading.current_thread() is self.thread:
+            # The queue thread has its own database connection; don't leave it open.
+            connection.close()
+
+
+suggestion_queue = SuggestionQueue(
+    getattr(settings, 'GYM_SUGGESTION_DELAY', DEFAULT_SUGGESTION_DELAY),
+    getattr(settings, 'GYM_SUGGESTION_MAX_DELAY', DEFAULT_SUGGESTION_MAX_DELAY),
+)
@@ -1,3 +1,379 @@
-from django.test import TestCase
+# gym_app/tests.py
+# Author: Haocheng Liu <easonlhc@bu.edu>
+# Description: This file tests the member data import, the member charts and their cache, and the
+#              suggestion queue.
 
-# Create your tests here.
+import contextlib
+import csv
+import io
+import os
+import tempfile
+import threading
+from unittest import mock
+import numpy as np
+from datetime import date
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from .cache import FigureCache
+from .charts import bmi_frequency_figure, stratified_sample
+from .models import (
+    MEMBER_DATA_COLUMNS, MEMBER_DATA_CSV, FitnessMetric, MemberData, MemberDataVersion, Profile, Suggestion,
+    WorkoutSession, load_member_data_from_csv,
+)
+from .suggestions import SuggestionQueue, regenerate_suggestions
+from .utils import generate_suggestions
+
+
+def quiet_member_load(filename, **kwargs):
+    """
+    Returns the summary of load_member_data_from_csv, without its report.
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        return load_member_data_from_csv(filename, **kwargs)
+
+
+def read_member_rows(count):
+    """
+    Returns the header and the first count rows of the bundled member data CSV.
+    """
+    with open(MEMBER_DATA_CSV, encoding='utf-8', newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        return header, [row for row, _ in zip(reader, range(count))]
+
+
+class MemberDataTestCase(TestCase):
+    """
+    Base for tests working on member data CSV files written to a temporary directory.
+    """
+
+    def setUp(self):
+        # Each test writes its files in a directory of its own.
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def write_csv(self, name, header, rows):
+        """
+        Writes the rows under header to a CSV file and returns its path.
+        """
+        filename = os.path.join(self.tmp.name, name)
+        with open(filename, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            writer.writerows(rows)
+        return filename
+
+
+class MemberDataImportTests(MemberDataTestCase):
+    """
+    The CSV import must load every valid row as it is written, and reject the others with the
+    line and reason instead of failing or storing them.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.header, self.rows = read_member_rows(20)
+
+    def with_value(self, row, column, value):
+        """
+        Returns a copy of the CSV row with one column replaced.
+        """
+        row = list(row)
+        row[self.header.index(column)] = value
+        return row
+
+    def test_valid_rows_are_loaded_as_written(self):
+        summary = quiet_member_load(self.write_csv('members.csv', self.header, self.rows), chunk_size=7)
+        self.assertEqual(summary['loaded'], 20)
+        self.assertEqual(summary['rejected'], 0)
+
+        # Rows keep their file order, and every field its CSV value.
+        members = list(MemberData.objects.order_by('pk'))
+        for member, row in zip(members, self.rows):
+            for field, (column, kind) in MEMBER_DATA_COLUMNS.items():
+                value = row[self.header.index(column)]
+                expected = {'int': int, 'float': float, 'text': str}[kind](value)
+                self.assertEqual(getattr(member, field), expected, f'{field} of {row}')
+
+    def test_invalid_rows_are_rejected_with_their_line(self):
+        rows = list(self.rows)
+        # Lines 22 to 27 of the file, spread over the last two chunks of 7 rows.
+        rows += [
+            self.with_value(self.rows[0], 'Age', 'abc'),
+            self.with_value(self.rows[1], 'Age', '30.5'),
+            self.with_value(self.rows[2], 'Gender', ''),
+            self.with_value(self.rows[3], 'Max_BPM', '1e20'),
+            self.with_value(self.rows[4], 'BMI', 'inf'),
+            self.with_value(self.rows[5], 'Workout_Type', 'x' * 51),
+        ]
+        summary = quiet_member_load(self.write_csv('members.csv', self.header, rows), chunk_size=7)
+
+        self.assertEqual(summary['loaded'], 20)
+        self.assertEqual(summary['rejected'], 6)
+        self.assertEqual(summary['rejected_rows'], [
+            (22, 'invalid Age'),
+            (23, 'invalid Age'),
+            (24, 'invalid Gender'),
+            (25, 'invalid Max_BPM'),
+            (26, 'invalid BMI'),
+            (27, 'invalid Workout_Type'),
+        ])
+        self.assertEqual(summary['rejected_reasons']['invalid Age'], 2)
+        self.assertEqual(MemberData.objects.count(), 20)
+
+    def test_load_replaces_the_data_and_bumps_the_version(self):
+        quiet_member_load(self.write_csv('members.csv', self.header, self.rows))
+        version = MemberDataVersion.current()
+        quiet_member_load(self.write_csv('fewer.csv', self.header, self.rows[:5]))
+        self.assertEqual(MemberData.objects.count(), 5)
+        self.assertEqual(MemberDataVersion.current(), version + 1)
+
+    def test_missing_column_leaves_the_data_untouched(self):
+        quiet_member_load(self.write_csv('members.csv', self.header, self.rows))
+        version = MemberDataVersion.current()
+        # Drop the BMI column from the header and every row.
+        bmi = self.header.index('BMI')
+        header = self.header[:bmi] + self.header[bmi + 1:]
+        rows = [row[:bmi] + row[bmi + 1:] for row in self.rows]
+        with self.assertRaisesMessage(ValueError, 'BMI'):
+            quiet_member_load(self.write_csv('no_bmi.csv', header, rows))
+        self.assertEqual(MemberData.objects.count(), 20)
+        self.assertEqual(MemberDataVersion.current(), version)
+
+
+class ScatterSampleTests(MemberDataTestCase):
+    """
+    The BMI and workout frequency chart must stay bounded however many members match: a
+    stratified sample beyond GYM_SCATTER_POINTS, and a heatmap beyond GYM_SCATTER_HEATMAP_ROWS.
+    """
+
+    def setUp(self):
+        super().setUp()
+        quiet_member_load(MEMBER_DATA_CSV)
+        self.members = MemberData.objects.count()
+        # Members per gender, to compare with what the chart draws.
+        self.genders = {
+            gender: MemberData.objects.filter(gender=gender).count()
+            for gender in MemberData.objects.values_list('gender', flat=True).distinct()
+        }
+
+    def test_sample_is_proportional_and_keeps_small_groups(self):
+        groups = np.array(['Male'] * 9000 + ['Female'] * 900 + ['Other'] * 5)
+        sample = stratified_sample(groups, 1000)
+        # Sorted distinct row indices, about budget of them.
+        self.assertTrue(np.all(np.diff(sample) > 0))
+        self.assertLessEqual(abs(len(sample) - 1000), 3)
+        counts = {group: int(np.count_nonzero(groups[sample] == group)) for group in ('Male', 'Female', 'Other')}
+        self.assertEqual(counts, {'Male': 908, 'Female': 90, 'Other': 1})
+        # The same seed always draws the same rows.
+        self.assertTrue(np.array_equal(sample, stratified_sample(groups, 1000)))
+
+    def test_all_members_are_drawn_within_the_budget(self):
+        figure = bmi_frequency_figure(MemberData.objects.all())
+        points = {trace.name: len(trace.x) for trace in figure.data}
+        self.assertEqual(points, self.genders)
+
+    @override_settings(GYM_SCATTER_POINTS=100)
+    def test_larger_sets_are_sampled_per_gender(self):
+        figure = bmi_frequency_figure(MemberData.objects.all())
+        points = {trace.name: len(trace.x) for trace in figure.data}
+        self.assertEqual(set(points), set(self.genders))
+        self.assertLessEqual(sum(points.values()), 100)
+        for gender, members in self.genders.items():
+            self.assertAlmostEqual(points[gender], 100 * members / self.members, delta=1)
+        self.assertIn(f'sample of {sum(points.values())} members', figure.layout.title.text)
+
+    @override_settings(GYM_SCATTER_HEATMAP_ROWS=500)
+    def test_largest_sets_become_a_heatmap_of_every_member(self):
+        figure = bmi_frequency_figure(MemberData.objects.all())
+        self.assertTrue(all(trace.type == 'heatmap' for trace in figure.data))
+        counts = {trace.name: int(np.sum(trace.z)) for trace in figure.data}
+        self.assertEqual(counts, self.genders)
+
+
+class FigureCacheTests(TestCase):
+    """
+    The figure cache must compute each value once per member data version, and keep serving
+    the previous value while a new load's value is computed.
+    """
+
+    def setUp(self):
+        # Values computed so far, by key.
+        self.computed = []
+
+    def compute(self, key, value):
+        """
+        Returns a compute callable for cache.get that records the call.
+        """
+        def compute():
+            self.computed.append(key)
+            return value
+        return compute
+
+    def test_value_is_computed_once(self):
+        cache = FigureCache(max_entries=4, workers=0)
+        self.assertEqual(cache.get('a', self.compute('a', 1)), 1)
+        self.assertEqual(cache.get('a', self.compute('a', 2)), 1)
+        self.assertEqual(self.computed, ['a'])
+        self.assertEqual(cache.stats()['hits'], 1)
+        self.assertEqual(cache.stats()['misses'], 1)
+
+    def test_least_recently_used_entry_is_dropped(self):
+        cache = FigureCache(max_entries=2, workers=0)
+        cache.get('a', self.compute('a', 1))
+        cache.get('b', self.compute('b', 2))
+        cache.get('a', self.compute('a', 1))
+        cache.get('c', self.compute('c', 3))
+        # 'b' was used least recently, so it is computed again.
+        cache.get('a', self.compute('a', 1))
+        cache.get('b', self.compute('b', 2))
+        self.assertEqual(self.computed, ['a', 'b', 'c', 'b'])
+        self.assertEqual(cache.stats()['evictions'], 2)
+
+    def test_failed_value_is_not_cached(self):
+        cache = FigureCache(max_entries=4, workers=0)
+
+        def fail():
+            raise RuntimeError('chart failed')
+        with self.assertRaises(RuntimeError):
+            cache.get('a', fail)
+        self.assertEqual(cache.get('a', self.compute('a', 1)), 1)
+
+    def test_stale_value_is_served_until_refreshed(self):
+        cache = FigureCache(max_entries=4, workers=0)
+        cache.get('a', self.compute('a', 'old'))
+        MemberDataVersion.bump()
+
+        # Without workers the refresh runs right away, but the stale value is still returned.
+        self.assertEqual(cache.get('a', self.compute('a', 'new')), 'old')
+        self.assertEqual(cache.get('a', self.compute('a', 'newer')), 'new')
+        self.assertEqual(self.computed, ['a', 'a'])
+        self.assertEqual(cache.stats()['stale_hits'], 1)
+
+    @mock.patch('gym_app.cache.MemberDataVersion.current')
+    def test_stale_value_is_refreshed_in_the_background(self, current):
+        cache = FigureCache(max_entries=4, workers=1)
+        current.return_value = 1
+        cache.get('a', self.compute('a', 'old'))
+        current.return_value = 2
+
+        # The refresh waits for the test to let it finish; the request doesn't.
+        release = threading.Event()
+
+        def slow():
+            release.wait(5)
+            return 'new'
+        self.assertEqual(cache.get('a', slow), 'old')
+        # A second stale request doesn't start another refresh.
+        self.assertEqual(cache.get('a', self.compute('a', 'other')), 'old')
+        release.set()
+        cache.executor.shutdown(wait=True)
+        self.assertEqual(cache.get('a', self.compute('a', 'other')), 'new')
+        self.assertEqual(self.computed, ['a'])
+
+    @mock.patch('gym_app.cache.MemberDataVersion.current', return_value=1)
+    def test_concurrent_misses_compute_once(self, current):
+        cache = FigureCache(max_entries=4, workers=0)
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow():
+            self.computed.append('a')
+            started.set()
+            release.wait(5)
+            return 'value'
+        results = []
+        first = threading.Thread(target=lambda: results.append(cache.get('a', slow)))
+        first.start()
+        started.wait(5)
+        # This request finds the value being computed and waits for it.
+        second = threading.Thread(target=lambda: results.append(cache.get('a', slow)))
+        second.start()
+        while cache.stats()['waits'] == 0 and second.is_alive():
+            second.join(0.01)
+        release.set()
+        first.join()
+        second.join()
+        self.assertEqual(results, ['value', 'value'])
+        self.assertEqual(self.computed, ['a'])
+
+
+class SuggestionQueueTests(TestCase):
+    """
+    Saving sessions and metrics must regenerate a profile's suggestions once per burst, after the
+    saves, instead of once per record inside the request.
+    """
+
+    def setUp(self):
+        user = User.objects.create_user(username='member', password='secret')
+        self.profile = Profile.objects.create(user=user, age=30, gender='Male', weight_kg=95,
+                                              height_m=1.75, experience_level=1)
+
+    def queue_without_thread(self, delay=60, max_delay=600):
+        """
+        Returns a queue whose profiles are only regenerated when the test takes them.
+        """
+        queue = SuggestionQueue(delay, max_delay)
+        # A thread that never runs, so schedule() doesn't start the real one.
+        queue.thread = threading.Thread()
+        return queue
+
+    def save_burst(self):
+        """
+        Saves three workout sessions and a fitness metric, and runs their commit callbacks.
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            for hours in (1, 1.5, 0.5):
+                WorkoutSession.objects.create(profile=self.profile, session_date=date.today(),
+                                              session_duration_hours=hours, calories_burned=0,
+                                              max_bpm=170, avg_bpm=140, resting_bpm=60)
+            FitnessMetric.objects.create(profile=self.profile, fat_percentage=28, water_intake_liters=1.5)
+
+    def test_burst_of_saves_regenerates_once(self):
+        queue = self.queue_without_thread()
+        with mock.patch('gym_app.signals.suggestion_queue', queue):
+            self.save_burst()
+        # Nothing is generated while saving; the profile is queued once.
+        self.assertFalse(Suggestion.objects.exists())
+        self.assertEqual(list(queue.queued), [self.profile.pk])
+
+        with mock.patch('gym_app.suggestions.regenerate_suggestions', wraps=regenerate_suggestions) as regenerate:
+            queue.flush()
+        regenerate.assert_called_once_with(self.profile.pk)
+        self.assertEqual(
+            sorted(Suggestion.objects.filter(profile=self.profile).values_list('title', flat=True)),
+            sorted(suggestion['title'] for suggestion in generate_suggestions(self.profile)),
+        )
+        self.assertEqual(queue.queued, {})
+
+    @mock.patch('gym_app.suggestions.time.monotonic')
+    def test_deadline_moves_back_up_to_max_delay(self, monotonic):
+        queue = self.queue_without_thread(delay=1, max_delay=3)
+        for now, due in ((0, 1), (0.5, 1.5), (2.8, 3)):
+            monotonic.return_value = now
+            queue.schedule(self.profile.pk)
+            self.assertEqual(queue.queued[self.profile.pk], (0, due))
+        self.assertEqual(queue.take_due(2.9), [])
+        self.assertEqual(queue.take_due(3), [self.profile.pk])
+        self.assertEqual(queue.queued, {})
+
+    def test_background_thread_regenerates_once(self):
+        queue = SuggestionQueue(delay=0.05, max_delay=1)
+        regenerated = threading.Event()
+        with mock.patch('gym_app.suggestions.regenerate_suggestions',
+                        side_effect=lambda profile_id: regenerated.set()) as regenerate:
+            for _ in range(3):
+                queue.schedule(self.profile.pk)
+            self.assertTrue(regenerated.wait(5))
+            # Give a wrongly repeated regeneration the time to happen.
+            queue.thread.join(0.2)
+        regenerate.assert_called_once_with(self.profile.pk)
+
+    def test_regenerating_replaces_the_suggestions(self):
+        regenerate_suggestions(self.profile.pk)
+        count = Suggestion.objects.filter(profile=self.profile).count()
+        self.assertGreater(count, 0)
+        regenerate_suggestions(self.profile.pk)
+        self.assertEqual(Suggestion.objects.filter(profile=self.profile).count(), count)
+        # A deleted profile is skipped.
+        regenerate_suggestions(self.profile.pk + 1)
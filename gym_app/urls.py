@@ -13,6 +13,7 @@ urlpatterns = [
 
     # Home
     path('', views.HomeView.as_view(), name='home'),
+    path('charts/<slug:name>/', views.MemberChartView.as_view(), name='member_chart'),
 
     # Profile URLs
     path('profile/create/', views.ProfileCreateView.as_view(), name='profile_create'),
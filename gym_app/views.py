@@ -15,7 +15,8 @@ from django.urls import reverse_lazy, reverse
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import HttpResponseForbidden
+from django.http import Http404, HttpResponse, HttpResponseForbidden
+from django.utils.cache import get_conditional_response, patch_cache_control
 from django.db import models
 from django.contrib.auth.models import User
 from .forms import (
@@ -24,11 +25,11 @@ from .forms import (
 )
 from .models import (
     Profile, WorkoutSession, WorkoutType,
-    FitnessMetric, Suggestion, MemberData, Message
+    FitnessMetric, Suggestion, Message
 )
-import plotly.express as px
-import pandas as pd
+from .charts import CHARTS, member_filters, has_member_data, chart_json, prepare_charts
 from django.db.models import Q  # For complex queries
+import hashlib
 
 
 class HomeView(LoginRequiredMixin, TemplateView):
@@ -71,102 +72,57 @@ class HomeView(LoginRequiredMixin, TemplateView):
             context['suggestions'] = None
             context['recent_workout_sessions'] = None
 
-        # Data visualization section using MemberData model.
-        member_data_qs = MemberData.objects.all()
-
-        # Apply filter conditions based on the filter form's validated data.
-        if form.is_valid():
-            gender = form.cleaned_data.get('gender')
-            min_age = form.cleaned_data.get('min_age')
-            max_age = form.cleaned_data.get('max_age')
-            experience_level = form.cleaned_data.get('experience_level')
-            workout_frequency = form.cleaned_data.get('workout_frequency')
-
-            if gender and gender != 'All':
-                member_data_qs = member_data_qs.filter(gender=gender)
-
-            if min_age is not None:
-                member_data_qs = member_data_qs.filter(age__gte=min_age)
-
-            if max_age is not None:
-                member_data_qs = member_data_qs.filter(age__lte=max_age)
-
-            if experience_level and experience_level != 'All':
-                member_data_qs = member_data_qs.filter(experience_level=int(experience_level))
-
-            if workout_frequency and workout_frequency != 'All':
-                if workout_frequency == 'Low':
-                    member_data_qs = member_data_qs.filter(workout_frequency__lte=2)
-                elif workout_frequency == 'High':
-                    member_data_qs = member_data_qs.filter(workout_frequency__gte=3)
-
-        # Proceed only if there is data after applying filters.
-        if member_data_qs.exists():
-            # Convert queryset to a list of dictionaries and then to a DataFrame for Plotly.
-            data_list = list(member_data_qs.values())
-            df = pd.DataFrame(data_list)
-
-            # Chart 1: Scatter plot showing relationship between BMI and Workout Frequency by Gender.
-            fig1 = px.scatter(df, x='bmi', y='workout_frequency', color='gender',
-                              title='Workout Frequency vs BMI by Gender',
-                              labels={'bmi': 'BMI', 'workout_frequency': 'Workout Frequency (days/week)'})
-            graph1 = fig1.to_html(full_html=False)
-
-            # Chart 2: Bar chart showing average BMI by age group.
-            df['age_group'] = pd.cut(df['age'], bins=[0, 20, 30, 40, 50, 60, 100],
-                                     labels=['0-20', '21-30', '31-40', '41-50', '51-60', '60+'])
-            avg_bmi_age = df.groupby('age_group')['bmi'].mean().reset_index()
-            fig2 = px.bar(avg_bmi_age, x='age_group', y='bmi', color='age_group',
-                          title='Average BMI by Age Group',
-                          labels={'age_group': 'Age Group', 'bmi': 'Average BMI'},
-                          text_auto=True)
-            graph2 = fig2.to_html(full_html=False)
-
-            # Chart 3: Pie chart showing distribution of workout types.
-            workout_type_counts = df['workout_type'].value_counts().reset_index()
-            workout_type_counts.columns = ['workout_type', 'count']
-            fig3 = px.pie(workout_type_counts, names='workout_type', values='count',
-                          title='Distribution of Workout Types',
-                          color_discrete_sequence=px.colors.qualitative.Pastel)
-            graph3 = fig3.to_html(full_html=False)
-
-            # Chart 4: Bar chart comparing average BMI for different workout frequency groups.
-            df['frequency_group'] = df['workout_frequency'].apply(
-                lambda x: '≤2 times/week' if x <= 2 else '≥3 times/week')
-            avg_bmi_by_frequency = df.groupby('frequency_group')['bmi'].mean().reset_index()
-            fig4 = px.bar(avg_bmi_by_frequency, x='frequency_group', y='bmi', color='frequency_group',
-                          title='Average BMI by Workout Frequency',
-                          labels={'frequency_group': 'Workout Frequency Group', 'bmi': 'Average BMI'},
-                          text_auto=True,
-                          color_discrete_sequence=px.colors.qualitative.Set2)
-            graph4 = fig4.to_html(full_html=False)
-
-            # Chart 5: Bar chart showing average calories burned by gender.
-            avg_calories_by_gender = df.groupby('gender')['calories_burned'].mean().reset_index()
-            fig5 = px.bar(avg_calories_by_gender, x='gender', y='calories_burned', color='gender',
-                          title='Average Calories Burned by Gender',
-                          labels={'gender': 'Gender', 'calories_burned': 'Average Calories Burned'},
-                          text_auto=True,
-                          color_discrete_sequence=px.colors.qualitative.Set1)
-            graph5 = fig5.to_html(full_html=False)
-
-            # Add the generated graphs to the context to be rendered in the template.
-            context['graph1'] = graph1
-            context['graph2'] = graph2
-            context['graph3'] = graph3
-            context['graph4'] = graph4
-            context['graph5'] = graph5
-
+        # Data visualization section using MemberData model. The page only lists the
+        # chart URLs; each chart is fetched from MemberChartView when it scrolls into view.
+        query = f'?{self.request.GET.urlencode()}' if self.request.GET else ''
+        if has_member_data(member_filters(self.request.GET)):
+            context['chart_urls'] = [
+                reverse('member_chart', args=[name]) + query for name in CHARTS
+            ]
         else:
-            # If no data exists after filtering, set graph variables to None.
-            context['graph1'] = None
-            context['graph2'] = None
-            context['graph3'] = None
-            context['graph4'] = None
-            context['graph5'] = None
+            # If no data exists after filtering, show no charts.
+            context['chart_urls'] = []
 
         return context
 
+    def render_to_response(self, context, **response_kwargs):
+        """
+        Starts computing the charts once the page is rendered, so they are ready when
+        the browser asks for them without slowing the page down.
+        """
+        response = super().render_to_response(context, **response_kwargs)
+        if context['chart_urls']:
+            filters = member_filters(self.request.GET)
+            response.add_post_render_callback(lambda response: prepare_charts(filters))
+        return response
+
+
+class MemberChartView(LoginRequiredMixin, View):
+    """
+    Returns one member data chart as Plotly figure JSON, filtered with the same
+    DataFilterForm parameters as the home page. Responses carry an ETag of their
+    content, so an unchanged chart is revalidated with a 304.
+    """
+    login_url = reverse_lazy('login')
+
+    def get(self, request, name):
+        if name not in CHARTS:
+            raise Http404(f'No chart named {name!r}')
+
+        filters = member_filters(request.GET)
+        if not has_member_data(filters):
+            raise Http404('No member data matches these filters.')
+
+        # Cached per filter combination until the member data is loaded again.
+        content = chart_json(name, filters)
+        etag = f'"{hashlib.md5(content.encode("utf-8")).hexdigest()}"'
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = HttpResponse(content, content_type='application/json')
+        response.headers['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
 
 class LoginView(AuthLoginView):
     """
@@ -0,0 +1,45 @@
+/* lazy_charts.js */
+
+/* Render Plotly charts on demand: every .lazy-chart element fetches its
+   figure JSON from data-src the first time it scrolls into view. */
+(function () {
+    function renderChart(element) {
+        fetch(element.dataset.src, { headers: { 'Accept': 'application/json' } })
+            .then(function (response) {
+                if (!response.ok) {
+                    throw new Error(response.status);
+                }
+                return response.json();
+            })
+            .then(function (figure) {
+                element.style.minHeight = '';
+                Plotly.newPlot(element, figure.data, figure.layout, { responsive: true });
+            })
+            .catch(function () {
+                element.textContent = 'This chart could not be loaded.';
+            });
+    }
+
+    document.addEventListener('DOMContentLoaded', function () {
+        var charts = document.querySelectorAll('.lazy-chart');
+
+        if (!('IntersectionObserver' in window)) {
+            charts.forEach(renderChart);
+            return;
+        }
+
+        // Start loading a little before the chart reaches the viewport
+        var observer = new IntersectionObserver(function (entries) {
+            entries.forEach(function (entry) {
+                if (entry.isIntersecting) {
+                    observer.unobserve(entry.target);
+                    renderChart(entry.target);
+                }
+            });
+        }, { rootMargin: '200px' });
+
+        charts.forEach(function (chart) {
+            observer.observe(chart);
+        });
+    });
+})();
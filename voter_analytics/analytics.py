@@ -0,0 +1,374 @@
+# voter_analytics/analytics.py
+
+import re
+from collections import defaultdict
+from functools import reduce
+from operator import or_
+from django.db.models import Case, Count, F, Q, Sum, Value, When
+from django.http import QueryDict
+from .models import (
+    ELECTION_BITS, ELECTION_CHOICES, PARTY_CODES, PARTY_NAMES, PrecinctRollup, Voter, VoterCube,
+    voted_in_all_condition,
+)
+
+# Election fields in display order, shared by the filters and the turnout chart
+ELECTIONS = [field for field, label in ELECTION_CHOICES]
+ELECTION_LABELS = dict(ELECTION_CHOICES)
+
+# Parties below this share of the filtered voters are merged into one slice
+OTHER_THRESHOLD = 0.02
+OTHER_LABEL = '其他'
+
+# Case-insensitive party name lookup for the party_affiliation parameter
+PARTY_CODES_BY_NAME = {name.upper(): code for name, code in PARTY_CODES.items()}
+
+# Cohorts compared at once, and how many the comparison page starts with
+MAX_COHORTS = 5
+DEFAULT_COHORTS = 2
+
+
+def parse_filters(params):
+    """
+    Normalize FilterForm GET parameters into a plain dict.
+    Malformed values are ignored, the same way the views always have.
+    """
+    def parse_int(value):
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return None
+
+    party = (params.get('party_affiliation') or '').strip()
+    if party and party != 'All':
+        # An unknown party name matches no voters (code 0 is never stored)
+        party_code = PARTY_CODES_BY_NAME.get(party.upper(), 0)
+    else:
+        party_code = None
+    voter_score = params.get('voter_score')
+
+    return {
+        'party': party_code,
+        'min_year': parse_int(params.get('min_dob')),
+        'max_year': parse_int(params.get('max_dob')),
+        'voter_score': parse_int(voter_score) if voter_score != 'All' else None,
+        'elections': tuple(sorted(set(params.getlist('elections')) & set(ELECTIONS))),
+    }
+
+
+def filter_signature(filters):
+    """
+    Canonical string for parsed filters, for use in cache keys. Filters that
+    select the same voters always produce the same signature.
+    """
+    return ';'.join(f'{name}={filters[name]}' for name in sorted(filters))
+
+
+def cohort_prefix(index):
+    """
+    FilterForm prefix of the index-th cohort on the comparison page.
+    """
+    return f'c{index}'
+
+
+def parse_cohorts(params):
+    """
+    Parsed filters for each cohort of a comparison: ?cohorts=N (at most
+    MAX_COHORTS) FilterForms whose fields are prefixed with cohort_prefix().
+    """
+    try:
+        count = int(params.get('cohorts', DEFAULT_COHORTS))
+    except (TypeError, ValueError):
+        count = DEFAULT_COHORTS
+    count = min(max(count, 1), MAX_COHORTS)
+
+    cohorts = []
+    for index in range(count):
+        prefix = f'{cohort_prefix(index)}-'
+        cohort_params = QueryDict(mutable=True)
+        for name, values in params.lists():
+            if name.startswith(prefix):
+                cohort_params.setlist(name[len(prefix):], values)
+        cohorts.append(parse_filters(cohort_params))
+    return cohorts
+
+
+def cohorts_signature(cohorts):
+    """
+    Canonical string for a list of parsed filters, for use in cache keys and
+    ETags. Order matters, since cohorts are shown in order.
+    """
+    return '|'.join(filter_signature(filters) for filters in cohorts)
+
+
+def describe_filters(filters):
+    """
+    Short human-readable label for parsed filters, e.g.
+    'Democrat, born 1960 or earlier'.
+    """
+    parts = []
+    if filters['party'] is not None:
+        parts.append(PARTY_NAMES.get(filters['party'], 'Unknown party'))
+    if filters['min_year'] is not None and filters['max_year'] is not None:
+        parts.append(f'born {filters["min_year"]}–{filters["max_year"]}')
+    elif filters['min_year'] is not None:
+        parts.append(f'born {filters["min_year"]} or later')
+    elif filters['max_year'] is not None:
+        parts.append(f'born {filters["max_year"]} or earlier')
+    if filters['voter_score'] is not None:
+        parts.append(f'voter score {filters["voter_score"]}')
+    if filters['elections']:
+        parts.append('voted in ' + ', '.join(ELECTION_LABELS[election] for election in filters['elections']))
+    return ', '.join(parts) or 'All voters'
+
+
+def filter_condition(filters):
+    """
+    Parsed filters (see parse_filters) as a single Q, for filter() or an
+    aggregate's filter=. Works on Voter and VoterCube alike.
+    """
+    condition = Q()
+
+    if filters['party'] is not None:
+        condition &= Q(party=filters['party'])
+
+    if filters['min_year'] is not None:
+        condition &= Q(birth_year__gte=filters['min_year'])
+
+    if filters['max_year'] is not None:
+        condition &= Q(birth_year__lte=filters['max_year'])
+
+    if filters['voter_score'] is not None:
+        condition &= Q(voter_score=filters['voter_score'])
+
+    return condition & voted_in_all_condition(filters['elections'])
+
+
+def filter_voters(filters, qs=None):
+    """
+    Apply parsed filters (see parse_filters) to a Voter queryset, or to a
+    VoterCube queryset to select the matching cells.
+    """
+    if qs is None:
+        qs = Voter.objects.all()
+    return qs.filter(filter_condition(filters))
+
+
+def voter_aggregates(qs):
+    """
+    Compute every number the graphs page needs in one grouped query.
+
+    Rows are grouped by (party, birth year) with a conditional count per
+    election bit, so the database scans the filtered voters once and Python only
+    folds a few thousand group rows. Given a VoterCube queryset the same query
+    sums the cells' voter counts instead, without touching Voter at all.
+
+    Returns a dict with:
+        birth_years: {year: voters}
+        parties: {party: voters}
+        elections: {election field: voters who took part}
+    """
+    # Each election's bit of the participation mask, counted conditionally
+    # in the same scan
+    def tally(**extra):
+        # A cube cell stands for `voters` voters, a Voter row for one
+        if qs.model is VoterCube:
+            return Sum('voters', **extra)
+        return Count('pk', **extra)
+
+    election_bits = {
+        f'{election}_bit': F('participation').bitand(bit)
+        for election, bit in ELECTION_BITS.items()
+    }
+    election_counts = {
+        election: tally(filter=Q(**{f'{election}_bit': bit}))
+        for election, bit in ELECTION_BITS.items()
+    }
+    # Grouping in the column order of voter_party_stats_idx lets SQLite answer
+    # straight from that covering index, without a temporary sort
+    rows = (
+        qs.order_by()
+        .alias(**election_bits)
+        .values('party', 'birth_year')
+        .annotate(total=tally(), **election_counts)
+    )
+
+    birth_years = defaultdict(int)
+    parties = defaultdict(int)
+    elections = dict.fromkeys(ELECTIONS, 0)
+    for row in rows:
+        birth_years[row['birth_year']] += row['total']
+        parties[PARTY_NAMES[row['party']]] += row['total']
+        for election in ELECTIONS:
+            # SUM over no matching cells is NULL rather than 0
+            elections[election] += row[election] or 0
+
+    return {
+        'birth_years': dict(birth_years),
+        'parties': dict(parties),
+        'elections': elections,
+    }
+
+
+def cohort_aggregates(qs, cohorts):
+    """
+    voter_aggregates for several cohorts at once, in a single grouped query.
+
+    Each row is tagged with a bitmask of the cohorts it belongs to (bit i for
+    cohort i) and grouped by (mask, party, birth year) with the same
+    per-election conditional counts as voter_aggregates, so the rows matching
+    any cohort are scanned once however many cohorts there are. Python then
+    adds each group to every cohort in its mask; a voter in two cohorts is
+    counted in both.
+
+    Takes a Voter or VoterCube queryset and a list of parsed filters; returns
+    one dict per cohort, in order, with the keys of voter_aggregates plus:
+        voters: voters in the cohort
+        turnout: {election field: share of the cohort who took part}
+    """
+    def tally(**extra):
+        if qs.model is VoterCube:
+            return Sum('voters', **extra)
+        return Count('pk', **extra)
+
+    conditions = [filter_condition(filters) for filters in cohorts]
+    membership = sum(
+        # An empty Q() (a cohort of all voters) can't be a When() condition
+        (Case(When(condition, then=Value(1 << index)), default=Value(0)) if condition else Value(1 << index)
+         for index, condition in enumerate(conditions)),
+        Value(0),
+    )
+    election_bits = {
+        f'{election}_bit': F('participation').bitand(bit)
+        for election, bit in ELECTION_BITS.items()
+    }
+    election_counts = {
+        election: tally(filter=Q(**{f'{election}_bit': bit}))
+        for election, bit in ELECTION_BITS.items()
+    }
+    if all(conditions):
+        # Only rows in some cohort are read. A cohort of all voters has an
+        # empty Q(), which an OR drops rather than treating as "every row",
+        # so then nothing can be skipped.
+        qs = qs.filter(reduce(or_, conditions))
+    rows = (
+        qs.order_by()
+        .alias(**election_bits)
+        .annotate(cohorts=membership)
+        .values('cohorts', 'party', 'birth_year')
+        .annotate(total=tally(), **election_counts)
+    )
+
+    results = [
+        {'birth_years': defaultdict(int), 'parties': defaultdict(int), 'elections': dict.fromkeys(ELECTIONS, 0)}
+        for filters in cohorts
+    ]
+    for row in rows:
+        for index, result in enumerate(results):
+            if not row['cohorts'] & (1 << index):
+                continue
+            result['birth_years'][row['birth_year']] += row['total']
+            result['parties'][PARTY_NAMES[row['party']]] += row['total']
+            for election in ELECTIONS:
+                # SUM over no matching cells is NULL rather than 0
+                result['elections'][election] += row[election] or 0
+
+    for result in results:
+        result['birth_years'] = dict(result['birth_years'])
+        result['parties'] = dict(result['parties'])
+        add_turnout(result)
+    return results
+
+
+def add_turnout(aggregates):
+    """
+    Add the cohort size and per-election turnout rates to a voter_aggregates
+    style dict, in place.
+    """
+    voters = sum(aggregates['parties'].values())
+    aggregates['voters'] = voters
+    aggregates['turnout'] = {
+        election: voted / voters if voters else 0.0
+        for election, voted in aggregates['elections'].items()
+    }
+    return aggregates
+
+
+def precinct_sort_key(precinct):
+    """
+    Sort precinct numbers numerically ('2' before '10'), then by any suffix.
+    """
+    number, suffix = re.match(r'(\d*)(.*)', precinct).groups()
+    return (int(number) if number else float('inf'), suffix)
+
+
+def precinct_summaries():
+    """
+    Voter counts, party mix and turnout for every precinct, summed from the
+    precinct rollup in one grouped query; Voter itself is not read.
+
+    Returns a dict of precinct number to:
+        voters: registered voters
+        parties: {party: voters}, largest first
+        elections: {election field: voters who took part}
+        turnout: {election field: share of the precinct's voters who took part}
+    in precinct order.
+    """
+    election_bits = {
+        f'{election}_bit': F('participation').bitand(bit)
+        for election, bit in ELECTION_BITS.items()
+    }
+    election_counts = {
+        election: Sum('voters', filter=Q(**{f'{election}_bit': bit}))
+        for election, bit in ELECTION_BITS.items()
+    }
+    rows = (
+        PrecinctRollup.objects.order_by()
+        .alias(**election_bits)
+        .values('precinct_number', 'party')
+        .annotate(total=Sum('voters'), **election_counts)
+    )
+
+    summaries = {}
+    for row in rows:
+        summary = summaries.setdefault(row['precinct_number'], {
+            'voters': 0,
+            'parties': defaultdict(int),
+            'elections': dict.fromkeys(ELECTIONS, 0),
+        })
+        summary['voters'] += row['total']
+        summary['parties'][PARTY_NAMES[row['party']]] += row['total']
+        for election in ELECTIONS:
+            # SUM over no matching rows is NULL rather than 0
+            summary['elections'][election] += row[election] or 0
+
+    for summary in summaries.values():
+        summary['parties'] = dict(sorted(summary['parties'].items(), key=lambda item: item[1], reverse=True))
+        summary['turnout'] = {
+            election: voted / summary['voters'] for election, voted in summary['elections'].items()
+        }
+    return {precinct: summaries[precinct] for precinct in sorted(summaries, key=precinct_sort_key)}
+
+
+def group_minor_parties(party_counts, threshold=OTHER_THRESHOLD):
+    """
+    Merge parties under `threshold` of all voters into a single 'Other' slice.
+    Returns (labels, values) sorted by descending count.
+    """
+    total_voters = sum(party_counts.values())
+    other_count = 0
+    filtered_party_counts = {}
+
+    for party, count in party_counts.items():
+        if count / total_voters < threshold:
+            other_count += count
+        else:
+            filtered_party_counts[party] = count
+
+    if other_count > 0:
+        filtered_party_counts[OTHER_LABEL] = other_count
+
+    sorted_items = sorted(filtered_party_counts.items(), key=lambda x: x[1], reverse=True)
+    if not sorted_items:
+        return [], []
+    labels, values = zip(*sorted_items)
+    return list(labels), list(values)
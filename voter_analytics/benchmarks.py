@@ -0,0 +1,246 @@
+# voter_analytics/benchmarks.py
+
+import contextlib
+import itertools
+import json
+import os
+import tempfile
+import time
+from collections import defaultdict
+from django.conf import settings
+from django.db import transaction
+from django.http import QueryDict
+from django.test import RequestFactory
+from .analytics import ELECTIONS, filter_voters, parse_filters, voter_aggregates
+from .cache import result_cache
+from .charts import CHARTS
+from .models import PARTY_NAMES, ROLLUPS, Household, Voter, VoterCube, load_data, rebuild_search_index
+from .pagination import encode_cursor
+from .synthetic import synthetic_voters, write_synthetic_csv
+from .views import ChartDataView, VotersListView
+
+# Filter combinations exercised by the graphs benchmarks, as GET query strings
+FILTER_MIXES = [
+    '',
+    'party_affiliation=Democrat',
+    'min_dob=1950&max_dob=1980',
+    'voter_score=3&elections=v20state&elections=v22general',
+]
+
+# Voter list pages timed by the scale benchmark; pages past the end are skipped
+LIST_PAGE_DEPTHS = [1, 10, 100, 1000, 10000]
+
+# Results of a reference run of benchmark_scale, compared against by later runs
+BASELINE_FILE = os.path.join(settings.BASE_DIR, 'voter_analytics', 'benchmark_baseline.json')
+
+# Slowdown over the baseline reported as a regression
+REGRESSION_TOLERANCE = 0.25
+
+
+@contextlib.contextmanager
+def synthetic_roll(count, seed=0, batch_size=5000):
+    """
+    Fill the Voter table with `count` synthetic voters for the duration of the
+    block. Everything runs in one transaction that is rolled back afterwards,
+    so the real roll is untouched.
+    """
+    with transaction.atomic():
+        voters = synthetic_voters(count, seed)
+        while True:
+            batch = list(itertools.islice(voters, batch_size))
+            if not batch:
+                break
+            Voter.objects.bulk_create(batch, batch_size=batch_size)
+        for rollup in ROLLUPS:
+            rollup.rebuild()
+        rebuild_search_index()
+        try:
+            yield
+        finally:
+            transaction.set_rollback(True)
+
+
+def per_row_graph_counts(qs):
+    """
+    The counting algorithm of the original GraphsView, ported to the current
+    schema: every filtered birth year and party is pulled into Python, then
+    each election is counted with its own query. The original read the
+    party_affiliation strings and one boolean column per election, which no
+    longer exist, so this is not the original code and not a measure of the
+    original schema's cost. Kept only as the baseline for benchmarks.
+    """
+    birth_year_counts = {}
+    for year in qs.values_list('date_of_birth__year', flat=True):
+        birth_year_counts[year] = birth_year_counts.get(year, 0) + 1
+
+    party_counts = defaultdict(int)
+    for party in qs.values_list('party', flat=True):
+        party_counts[PARTY_NAMES[party]] += 1
+
+    election_counts = {}
+    for election in ELECTIONS:
+        election_counts[election] = qs.voted_in_all([election]).count()
+
+    return {
+        'birth_years': birth_year_counts,
+        'parties': dict(party_counts),
+        'elections': election_counts,
+    }
+
+
+def time_call(func, repeat):
+    """
+    Return the best wall-clock time of `repeat` calls to func, in milliseconds.
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def benchmark_graph_aggregates(repeat=3):
+    """
+    Time per_row_graph_counts against voter_aggregates, over the Voter
+    table and over the voter cube, for each filter mix on whatever is
+    currently loaded.
+
+    Returns a list of result dicts, one per filter mix.
+    """
+    results = []
+    for query in FILTER_MIXES:
+        filters = parse_filters(QueryDict(query))
+        qs = filter_voters(filters)
+        cells = filter_voters(filters, VoterCube.objects.all())
+
+        per_row = per_row_graph_counts(qs)
+        if voter_aggregates(qs) != per_row:
+            raise AssertionError(f'Aggregates differ from the per-row counts for filter {query!r}')
+        if voter_aggregates(cells) != per_row:
+            raise AssertionError(f'Cube aggregates differ from the per-row counts for filter {query!r}')
+
+        results.append({
+            'filter': query or '(none)',
+            'per_row_ms': time_call(lambda: per_row_graph_counts(qs), repeat),
+            'grouped_ms': time_call(lambda: voter_aggregates(qs), repeat),
+            'cube_ms': time_call(lambda: voter_aggregates(cells), repeat),
+        })
+    return results
+
+
+def time_view(view, path, repeat, **kwargs):
+    """
+    Best time to render `path` with a class-based view, in milliseconds.
+    The filter result cache is emptied before each call, so every run does
+    the full work.
+    """
+    view_func = view.as_view()
+    request_factory = RequestFactory()
+
+    def render():
+        result_cache.clear()
+        response = view_func(request_factory.get(path), **kwargs)
+        if hasattr(response, 'render'):
+            response.render()
+        if response.status_code != 200:
+            raise AssertionError(f'{path} returned {response.status_code}')
+
+    return time_call(render, repeat)
+
+
+def benchmark_scale(rows, seed=0, repeat=3, workdir=None):
+    """
+    Generate a synthetic CSV roll of `rows` voters, load it with load_data,
+    and time the pages that depend on the roll size. Everything runs in one
+    transaction that is rolled back afterwards, so the real roll is
+    untouched.
+
+    Returns a flat dict of metric name to value; names ending in _s are
+    seconds, _ms milliseconds.
+    """
+    results = {}
+    with tempfile.TemporaryDirectory(dir=workdir) as tmp:
+        filename = os.path.join(tmp, 'voters.csv')
+        start = time.perf_counter()
+        write_synthetic_csv(filename, rows, seed)
+        results['generate_s'] = time.perf_counter() - start
+
+        with transaction.atomic():
+            # Time loading into an empty roll, not clearing out the current one
+            Voter.objects.all().delete()
+            Household.objects.all().delete()
+            for rollup in ROLLUPS:
+                rollup.objects.all().delete()
+            rebuild_search_index()
+            start = time.perf_counter()
+            load_data(filename)
+            results['ingest_s'] = time.perf_counter() - start
+            # Reloading the same file finds every row unchanged
+            start = time.perf_counter()
+            load_data(filename, incremental=True)
+            results['reload_s'] = time.perf_counter() - start
+
+            count = Voter.objects.count()
+            ordered = Voter.objects.order_by('last_name', 'first_name', 'id')
+            per_page = VotersListView.paginate_by
+            for depth in LIST_PAGE_DEPTHS:
+                if (depth - 1) * per_page >= count:
+                    break
+                results[f'list_page_{depth}_ms'] = time_view(VotersListView, f'/?page={depth}', repeat)
+                if depth > 1:
+                    # The same page reached by seeking from the previous page's last voter
+                    cursor = encode_cursor(ordered[(depth - 1) * per_page - 1], depth)
+                    results[f'list_keyset_{depth}_ms'] = time_view(VotersListView, f'/?after={cursor}', repeat)
+
+            for query in FILTER_MIXES:
+                name = query or 'all'
+                results[f'graphs[{name}]_ms'] = sum(
+                    time_view(ChartDataView, f'/?{query}', repeat, name=chart) for chart in CHARTS
+                )
+            transaction.set_rollback(True)
+    return results
+
+
+def load_baseline(filename=BASELINE_FILE):
+    """
+    Stored benchmark_scale results, as {roll size: {metric: value}}, or {}
+    if there is no baseline yet.
+    """
+    try:
+        with open(filename, encoding='utf-8') as f:
+            return {int(rows): metrics for rows, metrics in json.load(f).items()}
+    except FileNotFoundError:
+        return {}
+
+
+def save_baseline(results, filename=BASELINE_FILE):
+    """
+    Store benchmark_scale results, as {roll size: {metric: value}}, merged
+    into the existing baseline so sizes not rerun keep their numbers.
+    """
+    baseline = load_baseline(filename)
+    baseline.update(
+        (rows, {metric: round(value, 2) for metric, value in metrics.items()})
+        for rows, metrics in results.items()
+    )
+    with open(filename, 'w', encoding='utf-8') as f:
+        json.dump({str(rows): baseline[rows] for rows in sorted(baseline)}, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def compare_to_baseline(metrics, baseline_metrics, tolerance=REGRESSION_TOLERANCE):
+    """
+    Line up one roll size's metrics with the baseline's.
+
+    Returns a list of (metric, value, baseline value or None, relative change
+    or None, regressed) tuples; a metric regressed when it is more than
+    `tolerance` slower than the baseline.
+    """
+    rows = []
+    for metric, value in metrics.items():
+        base = baseline_metrics.get(metric)
+        change = (value - base) / base if base else None
+        rows.append((metric, value, base, change, change is not None and change > tolerance))
+    return rows
@@ -0,0 +1,120 @@
+# voter_analytics/cache.py
+
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from django.conf import settings
+from .analytics import filter_signature
+from .models import DataVersion
+
+# Entries kept when VOTER_ANALYTICS_RESULT_CACHE_SIZE is not set
+DEFAULT_CACHE_SIZE = 128
+
+
+class FilterResultCache:
+    """
+    In-process LRU cache of results computed for a set of parsed filters.
+
+    Entries are keyed by a kind ('charts', 'count', ...) and the filter
+    signature, so equivalent FilterForm queries (elections in another order,
+    party in another case, padded numbers) share one entry. The whole cache
+    belongs to one DataVersion: the first lookup after load_data bumps it
+    drops every entry at once.
+
+    A key is only ever computed by one thread at a time: threads missing on
+    a key that is already being computed wait for that result instead of
+    computing it again.
+
+    Each gunicorn worker has its own cache, so the counters are per process.
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.version = None
+        self.entries = OrderedDict()
+        # Futures of the results being computed right now, by key
+        self.pending = {}
+        self.hits = 0
+        self.misses = 0
+        self.waits = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get_or_compute(self, kind, filters, compute):
+        """
+        Return the cached result for (kind, filters), calling compute() and
+        storing its result on a miss, or waiting for the thread already
+        computing it.
+        """
+        version = DataVersion.current()
+        key = (kind, filter_signature(filters))
+
+        with self.lock:
+            if version != self.version:
+                self.entries.clear()
+                self.pending.clear()
+                self.version = version
+            if key in self.entries:
+                self.hits += 1
+                self.entries.move_to_end(key)
+                return self.entries[key]
+            pending = self.pending.get(key)
+            if pending is None:
+                self.misses += 1
+                pending = self.pending[key] = Future()
+                owner = True
+            else:
+                self.waits += 1
+                owner = False
+
+        if not owner:
+            # Raises whatever the computing thread's compute() raised
+            return pending.result()
+
+        # Compute outside the lock, so other keys are served meanwhile
+        try:
+            result = compute()
+        except BaseException as e:
+            with self.lock:
+                if self.pending.get(key) is pending:
+                    del self.pending[key]
+            pending.set_exception(e)
+            raise
+
+        with self.lock:
+            if self.pending.get(key) is pending:
+                del self.pending[key]
+            if version == self.version:
+                self.entries[key] = result
+                self.entries.move_to_end(key)
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+                    self.evictions += 1
+        pending.set_result(result)
+        return result
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        """
+        Counters for monitoring, as a JSON-friendly dict.
+        """
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'data_version': self.version,
+                'entries': len(self.entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'waits': self.waits,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else None,
+            }
+
+
+result_cache = FilterResultCache(
+    getattr(settings, 'VOTER_ANALYTICS_RESULT_CACHE_SIZE', DEFAULT_CACHE_SIZE)
+)
@@ -0,0 +1,287 @@
+# voter_analytics/charts.py
+
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import plotly.graph_objs as go
+from django.conf import settings
+from django.db import connection
+from .analytics import (
+    ELECTIONS, ELECTION_LABELS, add_turnout, cohort_aggregates, cohorts_signature, describe_filters,
+    filter_signature, filter_voters, group_minor_parties, voter_aggregates,
+)
+from .cache import result_cache
+from .models import DataVersion, VoterCube
+from .snapshot import get_snapshot
+
+logger = logging.getLogger(__name__)
+
+# Charts computed at once in the background when not set in settings
+DEFAULT_CHART_WORKERS = 3
+
+
+def chart_aggregates(filters):
+    """
+    Aggregates behind every graph for the parsed filters, cached until the
+    next load. They come from a single grouped query over the matching cells
+    of the voter cube, or from the in-memory snapshot when it is enabled.
+    """
+    def compute():
+        snapshot = get_snapshot()
+        if snapshot is not None:
+            return snapshot.aggregates(filters)
+        return voter_aggregates(filter_voters(filters, VoterCube.objects.all()))
+
+    return result_cache.get_or_compute('aggregates', filters, compute)
+
+
+def birth_year_figure(aggregates):
+    """
+    Graph 1: Distribution of Voters by Year of Birth (Histogram)
+    """
+    birth_year_counts = aggregates['birth_years']
+    sorted_years = sorted(birth_year_counts.keys())
+    sorted_counts = [birth_year_counts[year] for year in sorted_years]
+
+    hist_trace = go.Bar(x=sorted_years, y=sorted_counts)
+    hist_layout = go.Layout(
+        title='Distribution of Voters by Year of Birth',
+        xaxis=dict(title='Year of Birth'),
+        yaxis=dict(title='Number of Voters')
+    )
+    return go.Figure(data=[hist_trace], layout=hist_layout)
+
+
+def party_figure(aggregates):
+    """
+    Graph 2: Distribution of Voters by Party Affiliation (Pie Chart)
+    """
+    labels, values = group_minor_parties(aggregates['parties'])
+
+    pie_trace = go.Pie(
+        labels=labels,
+        values=values,
+        hoverinfo='label+percent+value',
+        textinfo='percent+label',
+        insidetextorientation='radial'
+    )
+    pie_layout = go.Layout(
+        title='Distribution of Voters by Party Affiliation',
+        width=800,
+        height=600,
+        legend=dict(
+            x=1,
+            y=0.5,
+            xanchor='left',
+            yanchor='middle'
+        ),
+        margin=dict(l=50, r=150, t=50, b=50),
+    )
+    return go.Figure(data=[pie_trace], layout=pie_layout)
+
+
+def election_figure(aggregates):
+    """
+    Graph 3: Participation in Past Elections (Bar Chart)
+    """
+    bar_x = [ELECTION_LABELS[election] for election in ELECTIONS]
+    bar_y = [aggregates['elections'][election] for election in ELECTIONS]
+
+    bar_trace = go.Bar(x=bar_x, y=bar_y)
+    bar_layout = go.Layout(
+        title='Participation in Past Elections',
+        xaxis=dict(title='Election'),
+        yaxis=dict(title='Number of Voters')
+    )
+    return go.Figure(data=[bar_trace], layout=bar_layout)
+
+
+# Charts served by ChartDataView, in page order
+CHARTS = {
+    'birth-years': birth_year_figure,
+    'parties': party_figure,
+    'elections': election_figure,
+}
+
+
+def chart_etag(name, filters):
+    """
+    ETag for a chart: it only changes with the data version and the
+    normalized filters, so it can be checked without building the chart.
+    """
+    digest = hashlib.sha1(f'{name}|{filter_signature(filters)}'.encode('utf-8')).hexdigest()[:16]
+    return f'"{DataVersion.current()}-{digest}"'
+
+
+def chart_json(name, filters):
+    """
+    Plotly figure JSON for one chart, cached per filter set until the next load.
+    """
+    return result_cache.get_or_compute(
+        f'chart:{name}', filters, lambda: CHARTS[name](chart_aggregates(filters)).to_json()
+    )
+
+
+def cohorts_key(cohorts):
+    """
+    Filters-like dict standing for a list of cohorts in result_cache keys.
+    """
+    return {'cohorts': cohorts_signature(cohorts)}
+
+
+def compare_aggregates(cohorts):
+    """
+    Aggregates for each cohort of a comparison (see analytics.cohort_aggregates),
+    cached until the next load. The database answers every cohort with one
+    grouped query over the voter cube; the in-memory snapshot, when enabled,
+    masks its arrays once per cohort instead.
+    """
+    def compute():
+        snapshot = get_snapshot()
+        if snapshot is not None:
+            return [add_turnout(snapshot.aggregates(filters)) for filters in cohorts]
+        return cohort_aggregates(VoterCube.objects.all(), cohorts)
+
+    return result_cache.get_or_compute('compare', cohorts_key(cohorts), compute)
+
+
+def compare_birth_year_figure(cohorts, results):
+    """
+    Birth year histograms of the cohorts, overlaid.
+    """
+    traces = []
+    for filters, aggregates in zip(cohorts, results):
+        years = sorted(aggregates['birth_years'])
+        traces.append(go.Bar(
+            x=years, y=[aggregates['birth_years'][year] for year in years],
+            name=describe_filters(filters), opacity=0.6,
+        ))
+    layout = go.Layout(
+        title='Distribution of Voters by Year of Birth',
+        barmode='overlay',
+        xaxis=dict(title='Year of Birth'),
+        yaxis=dict(title='Number of Voters')
+    )
+    return go.Figure(data=traces, layout=layout)
+
+
+def compare_party_figure(cohorts, results):
+    """
+    Share of each cohort in each party, as grouped bars. Minor parties are
+    merged the same way as on the graphs page.
+    """
+    traces = []
+    for filters, aggregates in zip(cohorts, results):
+        labels, values = group_minor_parties(aggregates['parties'])
+        voters = aggregates['voters']
+        traces.append(go.Bar(
+            x=labels, y=[value / voters for value in values], name=describe_filters(filters),
+        ))
+    layout = go.Layout(
+        title='Party Affiliation',
+        barmode='group',
+        xaxis=dict(title='Party Affiliation'),
+        yaxis=dict(title='Share of Cohort', tickformat='.0%')
+    )
+    return go.Figure(data=traces, layout=layout)
+
+
+def compare_turnout_figure(cohorts, results):
+    """
+    Turnout rate of each cohort in each past election, as grouped bars.
+    """
+    labels = [ELECTION_LABELS[election] for election in ELECTIONS]
+    traces = [
+        go.Bar(x=labels, y=[aggregates['turnout'][election] for election in ELECTIONS],
+               name=describe_filters(filters))
+        for filters, aggregates in zip(cohorts, results)
+    ]
+    layout = go.Layout(
+        title='Turnout in Past Elections',
+        barmode='group',
+        xaxis=dict(title='Election'),
+        yaxis=dict(title='Turnout', tickformat='.0%')
+    )
+    return go.Figure(data=traces, layout=layout)
+
+
+# Charts served by CompareChartView, in page order
+COMPARE_CHARTS = {
+    'birth-years': compare_birth_year_figure,
+    'parties': compare_party_figure,
+    'turnout': compare_turnout_figure,
+}
+
+
+def compare_etag(name, cohorts):
+    """
+    ETag for a comparison chart, like chart_etag.
+    """
+    return chart_etag(f'compare:{name}', cohorts_key(cohorts))
+
+
+def compare_json(name, cohorts):
+    """
+    Plotly figure JSON for one comparison chart, cached until the next load.
+    """
+    return result_cache.get_or_compute(
+        f'compare:{name}', cohorts_key(cohorts),
+        lambda: COMPARE_CHARTS[name](cohorts, compare_aggregates(cohorts)).to_json()
+    )
+
+
+_chart_executor = None
+
+
+def chart_executor():
+    """
+    The process-wide pool that computes charts ahead of their requests, with
+    VOTER_ANALYTICS_CHART_WORKERS threads, or None if that is 0.
+    """
+    global _chart_executor
+    workers = getattr(settings, 'VOTER_ANALYTICS_CHART_WORKERS', DEFAULT_CHART_WORKERS)
+    if workers and _chart_executor is None:
+        _chart_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='voter-charts')
+    return _chart_executor if workers else None
+
+
+def _compute_in_background(compute):
+    try:
+        compute()
+    except Exception:
+        logger.exception('Computing a chart in the background failed')
+    finally:
+        # Each pool thread has its own database connection; don't leave it open
+        connection.close()
+
+
+def prepare_charts(computations):
+    """
+    Start computing the given chart_json/compare_json calls on the chart
+    pool, without waiting for them.
+
+    The page listing the charts calls this, so the charts are computed side
+    by side while the browser loads Plotly, and the chart requests that
+    follow find them in result_cache (or wait for the one computation in
+    progress rather than starting their own).
+    """
+    executor = chart_executor()
+    if executor is None:
+        return
+    for compute in computations:
+        executor.submit(_compute_in_background, compute)
+
+
+def prepare_graphs(filters):
+    """
+    Start computing every graphs page chart for the parsed filters.
+    """
+    prepare_charts(partial(chart_json, name, filters) for name in CHARTS)
+
+
+def prepare_comparison(cohorts):
+    """
+    Start computing every comparison chart for the parsed cohorts.
+    """
+    prepare_charts(partial(compare_json, name, cohorts) for name in COMPARE_CHARTS)
@@ -0,0 +1,58 @@
+# voter_analytics/export.py
+
+import csv
+import io
+import json
+from .models import CSV_COLUMNS, format_voter
+
+# Voters fetched per database round trip, and written per response chunk
+EXPORT_CHUNK_SIZE = 2000
+
+# Content type and file extension of each export format
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'jsonl': ('application/x-ndjson', 'jsonl'),
+}
+
+
+def iter_voter_rows(qs, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yield lists of at most `chunk_size` CSV rows (see format_voter), reading
+    the queryset with a chunked iterator so memory use stays flat however
+    many voters match.
+    """
+    rows = []
+    for voter in qs.iterator(chunk_size=chunk_size):
+        rows.append(format_voter(voter))
+        if len(rows) >= chunk_size:
+            yield rows
+            rows = []
+    if rows:
+        yield rows
+
+
+def stream_csv(qs):
+    """
+    The voters as CSV text in chunks, with the same header as newton_voters.csv
+    (so an export can be fed back to load_data).
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    for rows in iter_voter_rows(qs):
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # Header only, when nothing matched
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def stream_jsonl(qs):
+    """
+    The voters as JSON lines in chunks, one object per voter keyed by the
+    newton_voters.csv column names.
+    """
+    for rows in iter_voter_rows(qs):
+        yield ''.join(json.dumps(dict(zip(CSV_COLUMNS, row))) + '\n' for row in rows)
@@ -2,21 +2,11 @@
 
 from django import forms
 import datetime
+from .models import ELECTION_CHOICES, PARTY_NAMES
 
 class FilterForm(forms.Form):
-    PARTY_CHOICES = [
-        ('All', 'All'),
-        ('Democrat', 'Democrat'),
-        ('Republican', 'Republican'),
-        ('Unaffiliated', 'Unaffiliated'),
-        ('Libertarian', 'Libertarian'),
-        ('Green', 'Green'),
-        ('Independent', 'Independent'),
-        ('Socialist', 'Socialist'),
-        ('Progressive', 'Progressive'),
-        ('Other', 'Other'),
-        # Add more options as needed based on your PARTY_MAP
-    ]
+    # Generated from PARTY_MAP so the filter always offers every stored party
+    PARTY_CHOICES = [('All', 'All')] + [(name, name) for name in PARTY_NAMES.values()]
     
     VOTER_SCORE_CHOICES = [
         ('All', 'All'),
@@ -27,13 +17,7 @@ class FilterForm(forms.Form):
         ('5', '5'),
     ]
     
-    ELECTION_CHOICES = [
-        ('v20state', '2020 State Election'),
-        ('v21town', '2021 Town Election'),
-        ('v21primary', '2021 Primary Election'),
-        ('v22general', '2022 General Election'),
-        ('v23town', '2023 Town Election'),
-    ]
+    ELECTION_CHOICES = ELECTION_CHOICES
     
     party_affiliation = forms.ChoiceField(
         choices=PARTY_CHOICES, 
@@ -69,6 +53,14 @@ class FilterForm(forms.Form):
         label='Voted in Elections'
     )
 
+class SearchForm(forms.Form):
+    # Matched against first and last names, street names and zip codes
+    q = forms.CharField(
+        required=False,
+        label='Search',
+        widget=forms.TextInput(attrs={'type': 'search', 'placeholder': 'Name, street or zip (Smi* for prefixes)'}),
+    )
+
 class DataFilterForm(forms.Form):
     GENDER_CHOICES = [
         ('All', 'All'),
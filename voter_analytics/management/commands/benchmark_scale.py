@@ -0,0 +1,57 @@
+# voter_analytics/management/commands/benchmark_scale.py
+
+from django.core.management.base import BaseCommand, CommandError
+from voter_analytics.benchmarks import (
+    BASELINE_FILE, REGRESSION_TOLERANCE, benchmark_scale, compare_to_baseline, load_baseline, save_baseline,
+)
+from voter_analytics.synthetic import parse_row_count
+
+
+class Command(BaseCommand):
+    help = ('Time load_data, voter list pages at several depths and the graphs for each filter mix '
+            'on synthetic rolls, and compare with the stored baseline.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=parse_row_count, nargs='+', default=[10_000, 100_000],
+                            help='Roll sizes to benchmark, e.g. 10k 100k 1M 5M (default: 10k 100k).')
+        parser.add_argument('--repeat', type=int, default=3,
+                            help='Runs per page measurement; the best time is reported.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--baseline', default=BASELINE_FILE,
+                            help='Baseline JSON file (default: voter_analytics/benchmark_baseline.json).')
+        parser.add_argument('--save-baseline', action='store_true',
+                            help='Store this run as the baseline for its roll sizes.')
+        parser.add_argument('--tolerance', type=float, default=REGRESSION_TOLERANCE,
+                            help='Slowdown over the baseline reported as a regression (default: 0.25).')
+        parser.add_argument('--fail-on-regression', action='store_true',
+                            help='Exit with an error if any metric regressed.')
+        parser.add_argument('--workdir', help='Directory for the generated CSV (default: system temp).')
+
+    def handle(self, *args, **options):
+        baseline = load_baseline(options['baseline'])
+        results = {}
+        regressions = []
+
+        for rows in options['rows']:
+            self.stdout.write(f'Benchmarking a synthetic roll of {rows:,} voters...')
+            metrics = benchmark_scale(rows, seed=options['seed'], repeat=options['repeat'],
+                                      workdir=options['workdir'])
+            results[rows] = metrics
+
+            width = max(len(metric) for metric in metrics)
+            self.stdout.write(f"{'metric':<{width}} {'value':>10} {'baseline':>10} {'change':>8}")
+            for metric, value, base, change, regressed in compare_to_baseline(
+                    metrics, baseline.get(rows, {}), options['tolerance']):
+                base_text = f'{base:>10.1f}' if base is not None else f"{'-':>10}"
+                change_text = f'{change:>+7.0%}' if change is not None else f"{'-':>7}"
+                flag = '  REGRESSION' if regressed else ''
+                self.stdout.write(f'{metric:<{width}} {value:>10.1f} {base_text} {change_text}{flag}')
+                if regressed:
+                    regressions.append(f'{metric} at {rows:,} rows')
+            self.stdout.write('')
+
+        if options['save_baseline']:
+            save_baseline(results, options['baseline'])
+            self.stdout.write(f"Saved baseline to {options['baseline']}.")
+        if regressions and options['fail_on_regression']:
+            raise CommandError('Regressed: ' + ', '.join(regressions))
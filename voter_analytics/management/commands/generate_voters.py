@@ -0,0 +1,25 @@
+# voter_analytics/management/commands/generate_voters.py
+
+import time
+from django.core.management.base import BaseCommand
+from voter_analytics.synthetic import parse_row_count, write_synthetic_csv
+
+
+class Command(BaseCommand):
+    help = ('Write a deterministic synthetic voter roll in the newton_voters.csv layout, '
+            'for loading with load_data.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('filename', help='CSV file to write.')
+        parser.add_argument('--rows', type=parse_row_count, default=10_000,
+                            help='Voters to generate, e.g. 10k, 100k, 1M, 5M (default: 10k).')
+        parser.add_argument('--seed', type=int, default=0,
+                            help='The same seed always produces the same file.')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        write_synthetic_csv(options['filename'], options['rows'], seed=options['seed'])
+        self.stdout.write(
+            f"Wrote {options['rows']:,} voters to {options['filename']} "
+            f"in {time.perf_counter() - start:.1f}s."
+        )
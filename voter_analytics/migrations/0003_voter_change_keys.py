@@ -0,0 +1,74 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:10
+
+import hashlib
+from collections import Counter
+from django.db import migrations, models
+
+
+# Frozen copy of Voter.DATA_FIELDS at the time of this migration
+DATA_FIELDS = [
+    'last_name', 'first_name',
+    'residential_address_street_number', 'residential_address_street_name',
+    'residential_address_apartment_number', 'residential_address_zip_code',
+    'date_of_birth', 'date_of_registration',
+    'party_affiliation', 'precinct_number',
+    'v20state', 'v21town', 'v21primary', 'v22general', 'v23town',
+    'voter_score',
+]
+
+
+def fill_change_keys(apps, schema_editor):
+    """
+    Compute natural_key and row_hash for voters loaded before incremental
+    loads existed, using the same rules as Voter.set_change_keys.
+    """
+    Voter = apps.get_model('voter_analytics', 'Voter')
+    seen = Counter()
+    batch = []
+    for voter in Voter.objects.order_by('id').iterator(chunk_size=2000):
+        identity = '|'.join([
+            voter.last_name.upper(),
+            voter.first_name.upper(),
+            voter.date_of_birth.isoformat(),
+            voter.date_of_registration.isoformat(),
+        ])
+        seen[identity] += 1
+        # Exact duplicates already in the table still need distinct keys
+        if seen[identity] > 1:
+            identity += f'#{seen[identity]}'
+        values = ['' if value is None else str(value)
+                  for value in (getattr(voter, field) for field in DATA_FIELDS)]
+        voter.natural_key = hashlib.sha1(identity.encode('utf-8')).hexdigest()
+        voter.row_hash = hashlib.sha1('\x1f'.join(values).encode('utf-8')).hexdigest()
+        batch.append(voter)
+        if len(batch) >= 900:
+            Voter.objects.bulk_update(batch, ['natural_key', 'row_hash'])
+            batch = []
+    Voter.objects.bulk_update(batch, ['natural_key', 'row_hash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voter_analytics', '0002_dataversion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='voter',
+            name='natural_key',
+            field=models.CharField(max_length=40, null=True),
+        ),
+        migrations.AddField(
+            model_name='voter',
+            name='row_hash',
+            field=models.CharField(default='', max_length=40),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fill_change_keys, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='voter',
+            name='natural_key',
+            field=models.CharField(max_length=40, unique=True),
+        ),
+    ]
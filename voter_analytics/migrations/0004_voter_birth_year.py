@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:40
+
+from django.db import migrations, models
+from django.db.models.functions import ExtractYear
+
+
+def fill_birth_year(apps, schema_editor):
+    Voter = apps.get_model('voter_analytics', 'Voter')
+    Voter.objects.update(birth_year=ExtractYear('date_of_birth'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voter_analytics', '0003_voter_change_keys'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='voter',
+            name='birth_year',
+            field=models.PositiveSmallIntegerField(null=True),
+        ),
+        migrations.RunPython(fill_birth_year, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='voter',
+            name='birth_year',
+            field=models.PositiveSmallIntegerField(db_index=True),
+        ),
+    ]
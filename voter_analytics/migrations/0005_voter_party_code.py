@@ -0,0 +1,66 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:05
+
+from django.db import migrations, models
+
+
+# Frozen copy of the party names in PARTY_MAP order; code = position + 1
+PARTY_NAMES = [
+    'Democrat', 'Republican', 'Unaffiliated', 'Libertarian', 'Green', 'Junk',
+    'Alliance', 'Citizens Choice', 'Independent', 'Quadripart', 'Socialist',
+    'Freedom Fighters', 'Heritage', 'Tea Party', 'American Alliance', 'Grassroots',
+    'Zero Party', 'Other', 'Progressive', 'Environmentalist', 'Veteran',
+    'Humanitarian', 'Youth', 'Workers', 'Eco-Efficient', 'Knowledgeable',
+]
+
+
+def encode_parties(apps, schema_editor):
+    """
+    Translate the stored party names into codes, matching the old
+    case-insensitive comparisons. Unknown names become 'Other'.
+    """
+    Voter = apps.get_model('voter_analytics', 'Voter')
+    codes = {name.upper(): code for code, name in enumerate(PARTY_NAMES, start=1)}
+    names = list(Voter.objects.values_list('party_affiliation', flat=True).distinct())
+    for name in names:
+        code = codes.get(name.strip().upper(), codes['OTHER'])
+        Voter.objects.filter(party_affiliation=name).update(party=code)
+
+
+def decode_parties(apps, schema_editor):
+    Voter = apps.get_model('voter_analytics', 'Voter')
+    for code, name in enumerate(PARTY_NAMES, start=1):
+        Voter.objects.filter(party=code).update(party_affiliation=name)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voter_analytics', '0004_voter_birth_year'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='voter',
+            name='party',
+            field=models.PositiveSmallIntegerField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='voter',
+            name='party_affiliation',
+            field=models.CharField(max_length=50, null=True),
+        ),
+        migrations.RunPython(encode_parties, decode_parties),
+        migrations.RemoveField(
+            model_name='voter',
+            name='party_affiliation',
+        ),
+        migrations.AlterField(
+            model_name='voter',
+            name='party',
+            field=models.PositiveSmallIntegerField(choices=[(1, 'Democrat'), (2, 'Republican'), (3, 'Unaffiliated'), (4, 'Libertarian'), (5, 'Green'), (6, 'Junk'), (7, 'Alliance'), (8, 'Citizens Choice'), (9, 'Independent'), (10, 'Quadripart'), (11, 'Socialist'), (12, 'Freedom Fighters'), (13, 'Heritage'), (14, 'Tea Party'), (15, 'American Alliance'), (16, 'Grassroots'), (17, 'Zero Party'), (18, 'Other'), (19, 'Progressive'), (20, 'Environmentalist'), (21, 'Veteran'), (22, 'Humanitarian'), (23, 'Youth'), (24, 'Workers'), (25, 'Eco-Efficient'), (26, 'Knowledgeable')]),
+        ),
+        migrations.AddIndex(
+            model_name='voter',
+            index=models.Index(fields=['party', 'birth_year', 'voter_score', 'v20state', 'v21town', 'v21primary', 'v22general', 'v23town'], name='voter_party_stats_idx'),
+        ),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:40
+
+from django.db import migrations, models
+from django.db.models import Case, Value, When
+
+
+# Frozen copy of the election fields in bit order
+ELECTIONS = ['v20state', 'v21town', 'v21primary', 'v22general', 'v23town']
+
+
+def pack_participation(apps, schema_editor):
+    Voter = apps.get_model('voter_analytics', 'Voter')
+    bits = [
+        Case(When(**{election: True}, then=Value(1 << bit)), default=Value(0))
+        for bit, election in enumerate(ELECTIONS)
+    ]
+    Voter.objects.update(participation=sum(bits[1:], bits[0]))
+
+
+def unpack_participation(apps, schema_editor):
+    Voter = apps.get_model('voter_analytics', 'Voter')
+    for bit, election in enumerate(ELECTIONS):
+        Voter.objects.update(**{election: Case(
+            When(participation__in=[mask for mask in range(1 << len(ELECTIONS)) if mask & (1 << bit)],
+                 then=Value(True)),
+            default=Value(False),
+        )})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voter_analytics', '0005_voter_party_code'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='voter',
+            name='voter_party_stats_idx',
+        ),
+        migrations.AddField(
+            model_name='voter',
+            name='participation',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(pack_participation, unpack_participation),
+        migrations.RemoveField(
+            model_name='voter',
+            name='v20state',
+        ),
+        migrations.RemoveField(
+            model_name='voter',
+            name='v21primary',
+        ),
+        migrations.RemoveField(
+            model_name='voter',
+            name='v21town',
+        ),
+        migrations.RemoveField(
+            model_name='voter',
+            name='v22general',
+        ),
+        migrations.RemoveField(
+            model_name='voter',
+            name='v23town',
+        ),
+        migrations.AddIndex(
+            model_name='voter',
+            index=models.Index(fields=['party', 'birth_year', 'voter_score', 'participation'], name='voter_party_stats_idx'),
+        ),
+    ]
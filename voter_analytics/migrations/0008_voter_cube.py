@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:53
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_voter_cube(apps, schema_editor):
+    Voter = apps.get_model('voter_analytics', 'Voter')
+    VoterCube = apps.get_model('voter_analytics', 'VoterCube')
+    cells = (
+        Voter.objects.order_by()
+        .values('party', 'birth_year', 'voter_score', 'participation')
+        .annotate(voters=Count('pk'))
+    )
+    VoterCube.objects.bulk_create([VoterCube(**cell) for cell in cells], batch_size=900)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voter_analytics', '0007_voter_list_order_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VoterCube',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('party', models.PositiveSmallIntegerField(choices=[(1, 'Democrat'), (2, 'Republican'), (3, 'Unaffiliated'), (4, 'Libertarian'), (5, 'Green'), (6, 'Junk'), (7, 'Alliance'), (8, 'Citizens Choice'), (9, 'Independent'), (10, 'Quadripart'), (11, 'Socialist'), (12, 'Freedom Fighters'), (13, 'Heritage'), (14, 'Tea Party'), (15, 'American Alliance'), (16, 'Grassroots'), (17, 'Zero Party'), (18, 'Other'), (19, 'Progressive'), (20, 'Environmentalist'), (21, 'Veteran'), (22, 'Humanitarian'), (23, 'Youth'), (24, 'Workers'), (25, 'Eco-Efficient'), (26, 'Knowledgeable')])),
+                ('birth_year', models.PositiveSmallIntegerField()),
+                ('voter_score', models.IntegerField()),
+                ('participation', models.PositiveIntegerField()),
+                ('voters', models.PositiveIntegerField()),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('party', 'birth_year', 'voter_score', 'participation'), name='voter_cube_cell')],
+            },
+        ),
+        migrations.RunPython(fill_voter_cube, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:10
+
+from django.db import migrations
+
+SEARCH_TABLE = 'voter_analytics_voter_search'
+SEARCH_COLUMNS = (
+    'first_name, last_name, residential_address_street_name, residential_address_zip_code'
+)
+
+
+def create_search_index(apps, schema_editor):
+    # FTS5 is SQLite only; on other databases search falls back to plain filters
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        f'CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5('
+        f"{SEARCH_COLUMNS}, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+    )
+    schema_editor.execute(
+        f'INSERT INTO {SEARCH_TABLE} (rowid, {SEARCH_COLUMNS}) '
+        f'SELECT id, {SEARCH_COLUMNS} FROM voter_analytics_voter'
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(f'DROP TABLE IF EXISTS {SEARCH_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voter_analytics', '0008_voter_cube'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
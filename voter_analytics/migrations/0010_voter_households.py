@@ -0,0 +1,124 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:45
+
+import hashlib
+import re
+from django.db import migrations, models
+
+
+# Frozen copies of the household rules and names at the time of this migration
+ADDRESS_ABBREVIATIONS = {
+    'STREET': 'ST', 'AVENUE': 'AVE', 'ROAD': 'RD', 'DRIVE': 'DR', 'LANE': 'LN',
+    'PLACE': 'PL', 'COURT': 'CT', 'TERRACE': 'TER', 'CIRCLE': 'CIR',
+    'BOULEVARD': 'BLVD', 'PARKWAY': 'PKWY', 'HIGHWAY': 'HWY',
+}
+APARTMENT_WORDS = {'APT', 'APARTMENT', 'UNIT', 'NO'}
+PARTY_NAMES = [
+    'Democrat', 'Republican', 'Unaffiliated', 'Libertarian', 'Green', 'Junk',
+    'Alliance', 'Citizens Choice', 'Independent', 'Quadripart', 'Socialist',
+    'Freedom Fighters', 'Heritage', 'Tea Party', 'American Alliance', 'Grassroots',
+    'Zero Party', 'Other', 'Progressive', 'Environmentalist', 'Veteran',
+    'Humanitarian', 'Youth', 'Workers', 'Eco-Efficient', 'Knowledgeable',
+]
+ELECTIONS = ['v20state', 'v21town', 'v21primary', 'v22general', 'v23town']
+
+
+def normalize_address_part(value, drop_words=()):
+    words = re.sub(r'[^\w\s]', ' ', (value or '').upper()).split()
+    return ' '.join(ADDRESS_ABBREVIATIONS.get(word, word) for word in words if word not in drop_words)
+
+
+def household_key(street_number, street_name, apartment, zip_code):
+    digits = re.sub(r'\D', '', zip_code or '')[:5]
+    address = '|'.join([
+        normalize_address_part(street_number),
+        normalize_address_part(street_name),
+        normalize_address_part(apartment, drop_words=APARTMENT_WORDS),
+        digits.zfill(5) if digits else '',
+    ])
+    return hashlib.sha1(address.encode('utf-8')).hexdigest()
+
+
+def fill_household_keys(apps, schema_editor):
+    Voter = apps.get_model('voter_analytics', 'Voter')
+    batch = []
+    for voter in Voter.objects.order_by('id').iterator(chunk_size=2000):
+        voter.household_key = household_key(
+            voter.residential_address_street_number,
+            voter.residential_address_street_name,
+            voter.residential_address_apartment_number,
+            voter.residential_address_zip_code,
+        )
+        batch.append(voter)
+        if len(batch) >= 900:
+            Voter.objects.bulk_update(batch, ['household_key'])
+            batch = []
+    Voter.objects.bulk_update(batch, ['household_key'])
+
+
+def fill_households(apps, schema_editor):
+    """
+    Summarize every household from its voters, the same way Household.rebuild does.
+    """
+    Voter = apps.get_model('voter_analytics', 'Voter')
+    Household = apps.get_model('voter_analytics', 'Household')
+    voters = Voter.objects.order_by('household_key').values_list(
+        'household_key', 'residential_address_street_number', 'residential_address_street_name',
+        'residential_address_apartment_number', 'residential_address_zip_code',
+        'party', 'participation',
+    )
+    batch = []
+    household = None
+    for key, number, street, apartment, zip_code, party, participation in voters.iterator(chunk_size=2000):
+        if household is None or household.key != key:
+            if len(batch) >= 900:
+                Household.objects.bulk_create(batch)
+                batch = []
+            household = Household(
+                key=key, street_number=number, street_name=street, apartment=apartment,
+                zip_code=zip_code, size=0, party_counts={},
+                election_counts=dict.fromkeys(ELECTIONS, 0),
+            )
+            batch.append(household)
+        household.size += 1
+        name = PARTY_NAMES[party - 1]
+        household.party_counts[name] = household.party_counts.get(name, 0) + 1
+        for bit, election in enumerate(ELECTIONS):
+            if participation & (1 << bit):
+                household.election_counts[election] += 1
+    Household.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voter_analytics', '0009_voter_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='voter',
+            name='household_key',
+            field=models.CharField(max_length=40, null=True),
+        ),
+        migrations.RunPython(fill_household_keys, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='voter',
+            name='household_key',
+            field=models.CharField(db_index=True, max_length=40),
+        ),
+        migrations.CreateModel(
+            name='Household',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=40, unique=True)),
+                ('street_number', models.CharField(max_length=10)),
+                ('street_name', models.CharField(max_length=100)),
+                ('apartment', models.CharField(blank=True, max_length=10, null=True)),
+                ('zip_code', models.CharField(max_length=10)),
+                ('size', models.PositiveIntegerField()),
+                ('party_counts', models.JSONField(default=dict)),
+                ('election_counts', models.JSONField(default=dict)),
+            ],
+        ),
+        migrations.RunPython(fill_households, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:18
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_precinct_rollup(apps, schema_editor):
+    Voter = apps.get_model('voter_analytics', 'Voter')
+    PrecinctRollup = apps.get_model('voter_analytics', 'PrecinctRollup')
+    rows = (
+        Voter.objects.order_by()
+        .values('precinct_number', 'party', 'participation')
+        .annotate(voters=Count('pk'))
+    )
+    PrecinctRollup.objects.bulk_create([PrecinctRollup(**row) for row in rows], batch_size=900)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voter_analytics', '0010_voter_households'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PrecinctRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('voters', models.PositiveIntegerField()),
+                ('precinct_number', models.CharField(max_length=10)),
+                ('party', models.PositiveSmallIntegerField(choices=[(1, 'Democrat'), (2, 'Republican'), (3, 'Unaffiliated'), (4, 'Libertarian'), (5, 'Green'), (6, 'Junk'), (7, 'Alliance'), (8, 'Citizens Choice'), (9, 'Independent'), (10, 'Quadripart'), (11, 'Socialist'), (12, 'Freedom Fighters'), (13, 'Heritage'), (14, 'Tea Party'), (15, 'American Alliance'), (16, 'Grassroots'), (17, 'Zero Party'), (18, 'Other'), (19, 'Progressive'), (20, 'Environmentalist'), (21, 'Veteran'), (22, 'Humanitarian'), (23, 'Youth'), (24, 'Workers'), (25, 'Eco-Efficient'), (26, 'Knowledgeable')])),
+                ('participation', models.PositiveIntegerField()),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('precinct_number', 'party', 'participation'), name='precinct_rollup_row')],
+            },
+        ),
+        migrations.RunPython(fill_precinct_rollup, migrations.RunPython.noop),
+    ]
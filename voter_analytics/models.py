@@ -2,8 +2,17 @@
 
 import csv
 import datetime
+import functools
+import hashlib
 import os
-from django.db import models
+import re
+import sys
+import time
+from array import array
+from collections import Counter
+from django.db import connection, models, reset_queries, transaction
+from django.db.models import Count, F, Min, Q
+from django.db.models.lookups import Exact
 from django.conf import settings
 
 # Mapping from party codes to full party names
@@ -34,9 +43,87 @@ PARTY_MAP = {
     'W': 'Workers',
     'EE': 'Eco-Efficient',
     'K': 'Knowledgeable',
-    # Add any other necessary mappings
+    # Add any other necessary mappings (at the end: see PARTY_CHOICES)
 }
 
+# Small-integer code for each distinct party name, numbered in PARTY_MAP order.
+# Voter.party stores these codes, so only ever append new parties to PARTY_MAP.
+PARTY_CHOICES = list(enumerate(dict.fromkeys(PARTY_MAP.values()), start=1))
+PARTY_CODES = {name: code for code, name in PARTY_CHOICES}
+PARTY_NAMES = dict(PARTY_CHOICES)
+
+# Elections recorded on the roll. Each one is a bit in Voter.participation,
+# numbered in list order, so a new election only needs a new entry at the end.
+ELECTION_CHOICES = [
+    ('v20state', '2020 State Election'),
+    ('v21town', '2021 Town Election'),
+    ('v21primary', '2021 Primary Election'),
+    ('v22general', '2022 General Election'),
+    ('v23town', '2023 Town Election'),
+]
+ELECTION_BITS = {field: 1 << bit for bit, (field, label) in enumerate(ELECTION_CHOICES)}
+
+def participation_mask(elections):
+    """
+    Bitmask with the bits of the given election fields set.
+    """
+    mask = 0
+    for election in elections:
+        mask |= ELECTION_BITS[election]
+    return mask
+
+def voted_in_all_condition(elections):
+    """
+    Q matching voters who took part in every one of `elections`, as a single
+    bitwise predicate on the participation column. Usable in filter() and as
+    an aggregate's filter=.
+    """
+    mask = participation_mask(elections)
+    if not mask:
+        return Q()
+    return Q(Exact(F('participation').bitand(mask), mask))
+
+class VoterQuerySet(models.QuerySet):
+    def voted_in_all(self, elections):
+        """
+        Voters who took part in every one of `elections`.
+        """
+        return self.filter(voted_in_all_condition(elections))
+
+# Address spellings folded together when grouping voters into households
+ADDRESS_ABBREVIATIONS = {
+    'STREET': 'ST', 'AVENUE': 'AVE', 'ROAD': 'RD', 'DRIVE': 'DR', 'LANE': 'LN',
+    'PLACE': 'PL', 'COURT': 'CT', 'TERRACE': 'TER', 'CIRCLE': 'CIR',
+    'BOULEVARD': 'BLVD', 'PARKWAY': 'PKWY', 'HIGHWAY': 'HWY',
+}
+APARTMENT_WORDS = frozenset({'APT', 'APARTMENT', 'UNIT', 'NO'})
+
+@functools.lru_cache(maxsize=4096)
+def normalize_address_part(value, drop_words=frozenset()):
+    """
+    Upper-case, strip punctuation, collapse spaces and abbreviate street
+    types, so '12 Walnut Street.' and '12 WALNUT ST' compare equal.
+    """
+    words = re.sub(r'[^\w\s]', ' ', (value or '').upper()).split()
+    return ' '.join(ADDRESS_ABBREVIATIONS.get(word, word) for word in words if word not in drop_words)
+
+def household_key(street_number, street_name, apartment, zip_code):
+    """
+    Key shared by every voter living at the same normalized address.
+    """
+    digits = re.sub(r'\D', '', zip_code or '')[:5]
+    address = '|'.join([
+        normalize_address_part(street_number),
+        normalize_address_part(street_name),
+        normalize_address_part(apartment, drop_words=APARTMENT_WORDS),
+        digits.zfill(5) if digits else '',
+    ])
+    return hashlib.sha1(address.encode('utf-8')).hexdigest()
+
+# The Voter columns FilterForm filters on; VoterCube keeps one row per
+# distinct combination of them
+CUBE_FIELDS = ['party', 'birth_year', 'voter_score', 'participation']
+
 class Voter(models.Model):
     """
     Represents a registered voter in Newton, MA.
@@ -52,76 +139,818 @@ class Voter(models.Model):
     # Dates
     date_of_birth = models.DateField()
     date_of_registration = models.DateField()
+    # Year of date_of_birth, stored so year-range filters and the birth-year
+    # histogram can use an index instead of extracting the year on every row
+    birth_year = models.PositiveSmallIntegerField(db_index=True)
+    # Same value for everyone at the same normalized address (see household_key),
+    # indexed so a voter's household is one lookup
+    household_key = models.CharField(max_length=40, db_index=True)
     
     # Party and Precinct
-    party_affiliation = models.CharField(max_length=50)
+    party = models.PositiveSmallIntegerField(choices=PARTY_CHOICES)
     precinct_number = models.CharField(max_length=10)
     
-    # Election Participation
-    v20state = models.BooleanField(default=False)
-    v21town = models.BooleanField(default=False)
-    v21primary = models.BooleanField(default=False)
-    v22general = models.BooleanField(default=False)
-    v23town = models.BooleanField(default=False)
+    # Election Participation: one bit per election in ELECTION_CHOICES
+    participation = models.PositiveIntegerField(default=0)
     
     # Voter Score
     voter_score = models.IntegerField()
-    
+
+    # Change tracking for incremental loads: a stable key derived from who the
+    # voter is, and a hash of everything else in their CSV row
+    natural_key = models.CharField(max_length=40, unique=True)
+    row_hash = models.CharField(max_length=40)
+
+    objects = VoterQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Serves party filters, and covers every column the graphs
+            # aggregation reads so it never has to touch the table rows
+            models.Index(
+                fields=['party', 'birth_year', 'voter_score', 'participation'],
+                name='voter_party_stats_idx',
+            ),
+            # Matches the voter list order, so list pages can seek to a cursor
+            models.Index(fields=['last_name', 'first_name', 'id'], name='voter_list_order_idx'),
+        ]
+
+    # Fields that come from the CSV file, i.e. everything row_hash covers
+    DATA_FIELDS = [
+        'last_name', 'first_name',
+        'residential_address_street_number', 'residential_address_street_name',
+        'residential_address_apartment_number', 'residential_address_zip_code',
+        'date_of_birth', 'date_of_registration',
+        'party', 'precinct_number', 'participation', 'voter_score',
+    ]
+
+    # Denormalized columns computed from DATA_FIELDS by refresh_derived_fields
+    DERIVED_FIELDS = ['birth_year', 'household_key']
+
     def __str__(self):
         return f'{self.first_name} {self.last_name} ({self.residential_address_street_number} {self.residential_address_street_name}, {self.residential_address_zip_code})'
 
-def load_data():
+    @property
+    def party_affiliation(self):
+        """
+        Full party name, e.g. 'Democrat'.
+        """
+        # Plain dict lookup: get_party_display() is slow enough to show up
+        # in load times, as compute_row_hash calls this for every row
+        return PARTY_NAMES.get(self.party, self.party)
+
+    def voted_in(self, election):
+        """
+        Whether the voter took part in the given election field, e.g. 'v22general'.
+        """
+        return bool(self.participation & ELECTION_BITS[election])
+
+    @property
+    def election_history(self):
+        """
+        (election label, voted) for every election in ELECTION_CHOICES.
+        """
+        return [(label, self.voted_in(field)) for field, label in ELECTION_CHOICES]
+
+    def save(self, *args, **kwargs):
+        """
+        Keep the derived columns in sync for single-row saves; the loaders
+        call refresh_derived_fields themselves before bulk writes.
+        """
+        self.refresh_derived_fields()
+        super().save(*args, **kwargs)
+
+    def refresh_derived_fields(self):
+        """
+        Fill in the denormalized columns from the CSV-derived fields.
+        """
+        self.birth_year = self.date_of_birth.year
+        self.household_key = household_key(
+            self.residential_address_street_number,
+            self.residential_address_street_name,
+            self.residential_address_apartment_number,
+            self.residential_address_zip_code,
+        )
+
+    def household_members(self):
+        """
+        The other voters at this voter's address.
+        """
+        return (
+            Voter.objects.filter(household_key=self.household_key)
+            .exclude(pk=self.pk)
+            .order_by('last_name', 'first_name', 'id')
+        )
+
+    def rollup_values(self):
+        """
+        This voter's values of the columns the rollup tables are keyed by.
+        """
+        return {field: getattr(self, field) for field in ROLLUP_FIELDS}
+
+    def identity(self):
+        """
+        The parts of a voter record that do not change between roll updates:
+        name, date of birth and date of registration.
+        """
+        return '|'.join([
+            self.last_name.upper(),
+            self.first_name.upper(),
+            self.date_of_birth.isoformat(),
+            self.date_of_registration.isoformat(),
+        ])
+
+    def compute_row_hash(self):
+        """
+        Hash of all CSV-derived fields, used to detect changed rows.
+        """
+        values = []
+        for field in self.DATA_FIELDS:
+            # Hash party names and per-election flags rather than the encoded
+            # columns, as rows were hashed before those encodings existed
+            if field == 'party':
+                values.append(self.party_affiliation)
+            elif field == 'participation':
+                values.extend(str(self.voted_in(election)) for election in ELECTION_BITS)
+            else:
+                value = getattr(self, field)
+                values.append('' if value is None else str(value))
+        return hashlib.sha1('\x1f'.join(values).encode('utf-8')).hexdigest()
+
+    def set_change_keys(self, identity=None):
+        """
+        Fill in natural_key and row_hash from the current field values.
+        """
+        identity = identity or self.identity()
+        self.natural_key = hashlib.sha1(identity.encode('utf-8')).hexdigest()
+        self.row_hash = self.compute_row_hash()
+
+class DataVersion(models.Model):
     """
-    Load voter data from a CSV file into the Voter model.
+    Single-row counter bumped every time load_data replaces the voter roll.
+    In-process caches built from Voter compare against it to detect stale data,
+    which also works across gunicorn workers.
     """
-    # Delete existing records to prevent duplicates
-    Voter.objects.all().delete()
-    
-    # Build the absolute path to the CSV file
-    filename = os.path.join(settings.BASE_DIR, 'voter_analytics', 'data', 'newton_voters.csv')
-    
-    voters = []
-    
-    with open(filename, 'r', encoding='utf-8') as f:
+    version = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'Voter data version {self.version}'
+
+    @classmethod
+    def current(cls):
+        """
+        Return the current data version (0 if the roll was never loaded).
+        """
+        return cls.objects.filter(pk=1).values_list('version', flat=True).first() or 0
+
+    @classmethod
+    def bump(cls):
+        """
+        Mark the voter data as changed.
+        """
+        cls.objects.get_or_create(pk=1)
+        cls.objects.filter(pk=1).update(version=F('version') + 1)
+
+class VoterRollup(models.Model):
+    """
+    Abstract base for tables of voter counts grouped by KEY_FIELDS, a subset
+    of the Voter columns: one row per distinct combination, holding how many
+    voters share it. load_data keeps every rollup in ROLLUPS in step with the
+    roll: a full load rebuilds them, an incremental load only adjusts the
+    rows its changes touch.
+    """
+    voters = models.PositiveIntegerField()
+
+    # Voter columns the rows are keyed by, set by subclasses
+    KEY_FIELDS = []
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def rebuild(cls):
+        """
+        Recount every row from the Voter table, in one INSERT ... SELECT so
+        the grouped rows never leave the database.
+        """
+        cls.objects.all().delete()
+        quote = connection.ops.quote_name
+        rollup_columns = ', '.join(quote(cls._meta.get_field(field).column) for field in cls.KEY_FIELDS)
+        voter_columns = ', '.join(quote(Voter._meta.get_field(field).column) for field in cls.KEY_FIELDS)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {quote(cls._meta.db_table)} ({rollup_columns}, voters) '
+                f'SELECT {voter_columns}, COUNT(*) FROM {quote(Voter._meta.db_table)} '
+                f'GROUP BY {voter_columns}'
+            )
+
+    @classmethod
+    def apply_deltas(cls, deltas):
+        """
+        Adjust counts by `deltas`, a mapping of row key (see key()) to the
+        change in voters. Rows that drop to zero are removed. If the table
+        turns out not to match Voter it is rebuilt.
+        """
+        deltas = {key: change for key, change in deltas.items() if change}
+        keys = list(deltas)
+        existing = {}
+        # One parameter per key field; stay under SQLite's limit
+        batch_size = LOOKUP_BATCH_SIZE // len(cls.KEY_FIELDS)
+        for i in range(0, len(keys), batch_size):
+            match = Q()
+            for key in keys[i:i + batch_size]:
+                match |= Q(**dict(zip(cls.KEY_FIELDS, key)))
+            existing.update((row.key(), row) for row in cls.objects.filter(match))
+
+        new, changed, emptied = [], [], []
+        for key, change in deltas.items():
+            row = existing.get(key)
+            voters = (row.voters if row else 0) + change
+            if voters < 0:
+                cls.rebuild()
+                return
+            if row is None:
+                new.append(cls(voters=voters, **dict(zip(cls.KEY_FIELDS, key))))
+            elif voters:
+                row.voters = voters
+                changed.append(row)
+            else:
+                emptied.append(row.pk)
+
+        cls.objects.bulk_create(new, batch_size=LOOKUP_BATCH_SIZE)
+        cls.objects.bulk_update(changed, ['voters'], batch_size=LOOKUP_BATCH_SIZE)
+        for i in range(0, len(emptied), LOOKUP_BATCH_SIZE):
+            cls.objects.filter(pk__in=emptied[i:i + LOOKUP_BATCH_SIZE]).delete()
+
+    @classmethod
+    def key_of(cls, values):
+        """
+        Row key for a voter, given a mapping of its column values.
+        """
+        return tuple(values[field] for field in cls.KEY_FIELDS)
+
+    def key(self):
+        return tuple(getattr(self, field) for field in self.KEY_FIELDS)
+
+class VoterCube(VoterRollup):
+    """
+    Pre-aggregated voter counts, one row per distinct combination of party,
+    birth year, voter score and election participation.
+
+    Those are exactly the columns FilterForm filters on, so any filter
+    selects whole cells and the graphs can be answered by summing a few
+    thousand cells instead of scanning Voter.
+    """
+    party = models.PositiveSmallIntegerField(choices=PARTY_CHOICES)
+    birth_year = models.PositiveSmallIntegerField()
+    voter_score = models.IntegerField()
+    participation = models.PositiveIntegerField()
+
+    KEY_FIELDS = CUBE_FIELDS
+
+    # Cells filter exactly like voters (see analytics.filter_voters)
+    objects = VoterQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            # Same column order as voter_party_stats_idx, so grouping by
+            # (party, birth_year) walks this index
+            models.UniqueConstraint(fields=CUBE_FIELDS, name='voter_cube_cell'),
+        ]
+
+    def __str__(self):
+        return f'{self.get_party_display()} {self.birth_year} score {self.voter_score}: {self.voters} voters'
+
+class PrecinctRollup(VoterRollup):
+    """
+    Voter counts per precinct, party and election participation: everything
+    the precinct dashboard shows, in a few thousand rows.
+    """
+    precinct_number = models.CharField(max_length=10)
+    party = models.PositiveSmallIntegerField(choices=PARTY_CHOICES)
+    participation = models.PositiveIntegerField()
+
+    KEY_FIELDS = ['precinct_number', 'party', 'participation']
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['precinct_number', 'party', 'participation'], name='precinct_rollup_row',
+            ),
+        ]
+
+    def __str__(self):
+        return f'Precinct {self.precinct_number} {self.get_party_display()}: {self.voters} voters'
+
+# Rollup tables maintained by load_data
+ROLLUPS = [VoterCube, PrecinctRollup]
+
+# Every Voter column some rollup is keyed by
+ROLLUP_FIELDS = list(dict.fromkeys(field for rollup in ROLLUPS for field in rollup.KEY_FIELDS))
+
+class Household(models.Model):
+    """
+    Everyone registered at one address, summarized: how many voters, their
+    party mix and how many of them took part in each election.
+
+    Rows are computed in bulk by load_data (all of them on a full load, only
+    the households it touched on an incremental one), never per request.
+    """
+    key = models.CharField(max_length=40, unique=True)
+    street_number = models.CharField(max_length=10)
+    street_name = models.CharField(max_length=100)
+    apartment = models.CharField(max_length=10, blank=True, null=True)
+    zip_code = models.CharField(max_length=10)
+    size = models.PositiveIntegerField()
+    # {party name: voters}
+    party_counts = models.JSONField(default=dict)
+    # {election field: voters who took part}
+    election_counts = models.JSONField(default=dict)
+
+    def __str__(self):
+        apartment = f', Apt {self.apartment}' if self.apartment else ''
+        return f'{self.street_number} {self.street_name}{apartment}, {self.zip_code}'
+
+    @property
+    def turnout(self):
+        """
+        (election label, voters who took part, share of the household) for
+        every election in ELECTION_CHOICES.
+        """
+        return [
+            (label, self.election_counts.get(field, 0), self.election_counts.get(field, 0) / self.size)
+            for field, label in ELECTION_CHOICES
+        ]
+
+    @classmethod
+    def rebuild(cls, keys=None):
+        """
+        Recompute the given household keys from the Voter table, or every
+        household when keys is None. Households left without voters are
+        removed.
+        """
+        if keys is None:
+            cls.objects.all().delete()
+            cls._create_from()
+            return
+        keys = list(set(keys))
+        for i in range(0, len(keys), LOOKUP_BATCH_SIZE):
+            batch = keys[i:i + LOOKUP_BATCH_SIZE]
+            cls.objects.filter(key__in=batch).delete()
+            cls._create_from(batch)
+
+    @classmethod
+    def _create_from(cls, keys=None):
+        """
+        Insert the households with the given keys (every household when keys
+        is None), counted from the Voter table.
+        """
+        if connection.vendor != 'sqlite':
+            voters = Voter.objects.all() if keys is None else Voter.objects.filter(household_key__in=keys)
+            cls._fold_from(voters)
+            return
+
+        # One INSERT ... SELECT: the inner query groups voters by (household,
+        # party), the outer one folds those rows into one per household, with
+        # SQLite's JSON functions building the party and election counts
+        quote = connection.ops.quote_name
+        column = {field.name: quote(field.column) for field in Voter._meta.concrete_fields}
+        address = {
+            'street_number': column['residential_address_street_number'],
+            'street_name': column['residential_address_street_name'],
+            'apartment': column['residential_address_apartment_number'],
+            'zip_code': column['residential_address_zip_code'],
+        }
+        party_groups = ', '.join([
+            f'{column["household_key"]} AS household_key',
+            f'{column["party"]} AS party',
+            'COUNT(*) AS voters',
+            *(f'MIN({voter_column}) AS {part}' for part, voter_column in address.items()),
+            *(f'SUM(({column["participation"]} & {bit}) != 0) AS {election}'
+              for election, bit in ELECTION_BITS.items()),
+        ])
+        where = ''
+        if keys is not None:
+            where = f'WHERE {column["household_key"]} IN ({", ".join(["%s"] * len(keys))})'
+        households = ', '.join([
+            'household_key',
+            *(f'MIN({part})' for part in address),
+            'SUM(voters)',
+            f'json_group_object(CASE party {" ".join(["WHEN %s THEN %s"] * len(PARTY_NAMES))} END, voters)',
+            f'json_object({", ".join(f"%s, SUM({election})" for election in ELECTION_BITS)})',
+        ])
+        household_columns = ', '.join(
+            quote(cls._meta.get_field(field).column)
+            for field in ['key', *address, 'size', 'party_counts', 'election_counts']
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {quote(cls._meta.db_table)} ({household_columns}) '
+                f'SELECT {households} FROM ('
+                f'SELECT {party_groups} FROM {quote(Voter._meta.db_table)} {where} '
+                f'GROUP BY {column["household_key"]}, {column["party"]}'
+                f') GROUP BY household_key',
+                [*(value for code, name in PARTY_NAMES.items() for value in (code, name)), *ELECTION_BITS,
+                 *(keys or [])],
+            )
+
+    @classmethod
+    def _fold_from(cls, voters):
+        # One grouped row per (household, party), in household order, folded
+        # into one Household at a time
+        election_counts = {
+            election: Count('pk', filter=Q(**{f'{election}_bit': bit}))
+            for election, bit in ELECTION_BITS.items()
+        }
+        rows = (
+            voters.order_by('household_key')
+            .alias(**{f'{election}_bit': F('participation').bitand(bit) for election, bit in ELECTION_BITS.items()})
+            .values('household_key', 'party')
+            .annotate(
+                voters=Count('pk'),
+                street_number=Min('residential_address_street_number'),
+                street_name=Min('residential_address_street_name'),
+                apartment=Min('residential_address_apartment_number'),
+                zip_code=Min('residential_address_zip_code'),
+                **election_counts,
+            )
+        )
+
+        batch = []
+        household = None
+        for row in rows.iterator(chunk_size=LOAD_CHUNK_SIZE):
+            if household is None or household.key != row['household_key']:
+                household = cls(
+                    key=row['household_key'],
+                    street_number=row['street_number'],
+                    street_name=row['street_name'],
+                    apartment=row['apartment'],
+                    zip_code=row['zip_code'],
+                    size=0,
+                    party_counts={},
+                    election_counts=dict.fromkeys(ELECTION_BITS, 0),
+                )
+                batch.append(household)
+            household.size += row['voters']
+            household.party_counts[PARTY_NAMES[row['party']]] = row['voters']
+            for election in ELECTION_BITS:
+                household.election_counts[election] += row[election]
+            if len(batch) > LOAD_CHUNK_SIZE:
+                # The last household may still get more parties
+                cls.objects.bulk_create(batch[:-1])
+                batch = batch[-1:]
+        cls.objects.bulk_create(batch)
+
+# SQLite FTS5 table indexing voter names and addresses for search. It is
+# created by migration 0009 and keyed by voter id (its rowid); the loaders
+# keep it in step with the Voter table.
+SEARCH_TABLE = 'voter_analytics_voter_search'
+SEARCH_COLUMNS = [
+    'first_name', 'last_name', 'residential_address_street_name', 'residential_address_zip_code',
+]
+
+def search_index_available():
+    """
+    Whether the FTS5 search table exists, i.e. the database is SQLite.
+    """
+    return connection.vendor == 'sqlite'
+
+def _copy_to_search_index(where='', params=()):
+    columns = ', '.join(SEARCH_COLUMNS)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {SEARCH_TABLE} (rowid, {columns}) '
+            f'SELECT id, {columns} FROM {Voter._meta.db_table} {where}',
+            params,
+        )
+
+def rebuild_search_index():
+    """
+    Re-index every voter.
+    """
+    if not search_index_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+    _copy_to_search_index()
+
+def unindex_voters(ids):
+    """
+    Remove the given voter ids from the search index.
+    """
+    if not search_index_available():
+        return
+    ids = list(ids)
+    for i in range(0, len(ids), LOOKUP_BATCH_SIZE):
+        batch = ids[i:i + LOOKUP_BATCH_SIZE]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {SEARCH_TABLE} WHERE rowid IN ({", ".join(["%s"] * len(batch))})', batch,
+            )
+
+def reindex_voters(ids):
+    """
+    (Re-)index the given voter ids from their current rows.
+    """
+    if not search_index_available():
+        return
+    ids = list(ids)
+    unindex_voters(ids)
+    for i in range(0, len(ids), LOOKUP_BATCH_SIZE):
+        batch = ids[i:i + LOOKUP_BATCH_SIZE]
+        _copy_to_search_index(f'WHERE id IN ({", ".join(["%s"] * len(batch))})', batch)
+
+# Columns of newton_voters.csv read by load_data, in file order
+CSV_COLUMNS = [
+    'Last Name',
+    'First Name',
+    'Residential Address - Street Number',
+    'Residential Address - Street Name',
+    'Residential Address - Apartment Number',
+    'Residential Address - Zip Code',
+    'Date of Birth',
+    'Date of Registration',
+    'Party Affiliation',
+    'Precinct Number',
+    *(field for field, label in ELECTION_CHOICES),
+    'voter_score',
+]
+
+VOTER_CSV = os.path.join(settings.BASE_DIR, 'voter_analytics', 'data', 'newton_voters.csv')
+
+# Rows parsed and inserted per step; memory use is bounded by this, not the file size
+LOAD_CHUNK_SIZE = 5000
+
+def parse_boolean(value):
+    """
+    Parse the TRUE/FALSE election columns.
+    """
+    return value.strip().upper() == 'TRUE'
+
+def parse_voter(row):
+    """
+    Build an unsaved Voter from one CSV row.
+    """
+    # Clean and standardize party name; default to 'Other' if mapping not found
+    party_code = row['Party Affiliation'].strip().upper()
+
+    voter = Voter(
+        last_name=row['Last Name'].strip(),
+        first_name=row['First Name'].strip(),
+        residential_address_street_number=row['Residential Address - Street Number'].strip(),
+        residential_address_street_name=row['Residential Address - Street Name'].strip(),
+        residential_address_apartment_number=row['Residential Address - Apartment Number'].strip() or None,
+        residential_address_zip_code=row['Residential Address - Zip Code'].strip(),
+        date_of_birth=datetime.date.fromisoformat(row['Date of Birth'].strip()),
+        date_of_registration=datetime.date.fromisoformat(row['Date of Registration'].strip()),
+        party=PARTY_CODES[PARTY_MAP.get(party_code, 'Other')],
+        precinct_number=row['Precinct Number'].strip(),
+        # Files from before an election was added simply lack its column
+        participation=participation_mask(
+            election for election in ELECTION_BITS if parse_boolean(row.get(election, ''))
+        ),
+        voter_score=int(row['voter_score']),
+    )
+    voter.refresh_derived_fields()
+    voter.set_change_keys()
+    return voter
+
+# Party Affiliation code written out for each stored party: the first
+# PARTY_MAP code with that name
+PARTY_CSV_CODES = {PARTY_CODES[name]: code for code, name in reversed(PARTY_MAP.items())}
+
+def format_voter(voter):
+    """
+    The values of one CSV row for a Voter, in CSV_COLUMNS order; the
+    inverse of parse_voter.
+    """
+    return [
+        voter.last_name,
+        voter.first_name,
+        voter.residential_address_street_number,
+        voter.residential_address_street_name,
+        voter.residential_address_apartment_number or '',
+        voter.residential_address_zip_code,
+        voter.date_of_birth.isoformat(),
+        voter.date_of_registration.isoformat(),
+        PARTY_CSV_CODES[voter.party],
+        voter.precinct_number,
+        *('TRUE' if voter.voted_in(election) else 'FALSE' for election in ELECTION_BITS),
+        str(voter.voter_score),
+    ]
+
+def read_voter_chunks(filename, chunk_size=LOAD_CHUNK_SIZE):
+    """
+    Stream the CSV file as lists of at most `chunk_size` unsaved Voters.
+    Rows that fail to parse are reported and skipped.
+    """
+    with open(filename, 'r', encoding='utf-8', newline='') as f:
         reader = csv.DictReader(f)
+        chunk = []
         for row in reader:
             try:
-                # Parse dates
-                date_of_birth = datetime.datetime.strptime(row['Date of Birth'], '%Y-%m-%d').date()
-                date_of_registration = datetime.datetime.strptime(row['Date of Registration'], '%Y-%m-%d').date()
-                
-                # Parse boolean fields
-                def parse_boolean(value):
-                    return value.strip().upper() == 'TRUE'
-                
-                # Clean and standardize party name
-                raw_party_code = row['Party Affiliation']
-                party_code = raw_party_code.strip().upper()
-                party_affiliation = PARTY_MAP.get(party_code, 'Other')  # Default to 'Other' if mapping not found
-
-                # Create the Voter instance with the mapped full party name
-                voter = Voter(
-                    last_name=row['Last Name'].strip(),
-                    first_name=row['First Name'].strip(),
-                    residential_address_street_number=row['Residential Address - Street Number'].strip(),
-                    residential_address_street_name=row['Residential Address - Street Name'].strip(),
-                    residential_address_apartment_number=row['Residential Address - Apartment Number'].strip() or None,
-                    residential_address_zip_code=row['Residential Address - Zip Code'].strip(),
-                    date_of_birth=date_of_birth,
-                    date_of_registration=date_of_registration,
-                    party_affiliation=party_affiliation,  # Use the mapped full name here
-                    precinct_number=row['Precinct Number'].strip(),
-                    v20state=parse_boolean(row['v20state']),
-                    v21town=parse_boolean(row['v21town']),
-                    v21primary=parse_boolean(row['v21primary']),
-                    v22general=parse_boolean(row['v22general']),
-                    v23town=parse_boolean(row['v23town']),
-                    voter_score=int(row['voter_score'])
-                )
-                voters.append(voter)
+                chunk.append(parse_voter(row))
             except Exception as e:
-                print(f"Skipped row due to error: {e}")
-    
-    # Bulk create the Voter instances
-    Voter.objects.bulk_create(voters)
-    print(f'Done. Created {Voter.objects.count()} Voter records.')
+                print(f"Skipped line {reader.line_num} due to error: {e}")
+                continue
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+def peak_memory_mb():
+    """
+    Peak resident memory of this process in MB, or None where unsupported.
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+# SQLite limits the number of parameters in one statement
+LOOKUP_BATCH_SIZE = 900
+
+def replace_voters(filename, chunk_size):
+    """
+    Delete every voter and insert the whole file. Must run in a transaction.
+    Rows repeating an earlier row's natural key are counted as 'duplicate'
+    and not inserted.
+    """
+    # Delete existing records to prevent duplicates
+    Voter.objects.all().delete()
+
+    rows = 0
+    for chunk in read_voter_chunks(filename, chunk_size):
+        # A row repeating an earlier voter's natural key is dropped
+        Voter.objects.bulk_create(chunk, batch_size=chunk_size, ignore_conflicts=True)
+        rows += len(chunk)
+        # With DEBUG on, Django keeps the SQL of every insert; don't let it pile up
+        reset_queries()
+
+    created = Voter.objects.count()
+    if rows > created:
+        print(f"Dropped {rows - created} rows repeating an earlier voter's name, "
+              f"date of birth and date of registration")
+
+    for rollup in ROLLUPS:
+        rollup.rebuild()
+    Household.rebuild()
+    rebuild_search_index()
+    return {'created': created, 'duplicate': rows - created}
+
+def apply_voter_changes(filename, chunk_size):
+    """
+    Compare the file with the table by natural key and row hash, and write
+    only the differences: new voters are inserted, changed rows updated in
+    place (keeping their primary key) and voters missing from the file
+    deleted. The rollup tables, the households and the search index are
+    adjusted by the same differences. Must run in a transaction. As in
+    replace_voters, a row repeating an earlier row's natural key is counted
+    as 'duplicate' and ignored.
+    """
+    summary = {'created': 0, 'updated': 0, 'unchanged': 0, 'deleted': 0, 'duplicate': 0}
+    seen_ids = array('q')
+    # Natural keys read so far, as 20-byte digests: like replace_voters, the
+    # first row for a key wins and later ones are counted as duplicates
+    seen_keys = set()
+    rollup_deltas = {rollup: Counter() for rollup in ROLLUPS}
+    touched_households = set()
+
+    def count_in_rollups(values, change):
+        for rollup, deltas in rollup_deltas.items():
+            deltas[rollup.key_of(values)] += change
+
+    for chunk in read_voter_chunks(filename, chunk_size):
+        rows = {}
+        for voter in chunk:
+            digest = bytes.fromhex(voter.natural_key)
+            if digest in seen_keys:
+                summary['duplicate'] += 1
+                continue
+            seen_keys.add(digest)
+            rows[voter.natural_key] = voter
+        keys = list(rows)
+        existing = {}
+        for i in range(0, len(keys), LOOKUP_BATCH_SIZE):
+            existing.update(
+                (key, (pk, row_hash, household, dict(zip(ROLLUP_FIELDS, values))))
+                for key, pk, row_hash, household, *values in
+                Voter.objects.filter(natural_key__in=keys[i:i + LOOKUP_BATCH_SIZE])
+                .values_list('natural_key', 'id', 'row_hash', 'household_key', *ROLLUP_FIELDS)
+            )
+
+        new, changed = [], []
+        for key, voter in rows.items():
+            if key not in existing:
+                new.append(voter)
+                count_in_rollups(voter.rollup_values(), 1)
+                touched_households.add(voter.household_key)
+                continue
+            voter.pk, row_hash, household, old_values = existing[key]
+            seen_ids.append(voter.pk)
+            if voter.row_hash == row_hash:
+                summary['unchanged'] += 1
+            else:
+                changed.append(voter)
+                count_in_rollups(old_values, -1)
+                count_in_rollups(voter.rollup_values(), 1)
+                touched_households.update([household, voter.household_key])
+
+        for voter in Voter.objects.bulk_create(new, batch_size=chunk_size):
+            if voter.pk is not None:
+                seen_ids.append(voter.pk)
+        Voter.objects.bulk_update(
+            changed, Voter.DATA_FIELDS + Voter.DERIVED_FIELDS + ['row_hash'], batch_size=LOOKUP_BATCH_SIZE,
+        )
+        reindex_voters(voter.pk for voter in new + changed if voter.pk is not None)
+        summary['created'] += len(new)
+        summary['updated'] += len(changed)
+        reset_queries()
+
+    def delete_voters(ids):
+        missing = Voter.objects.filter(id__in=ids)
+        for household, *values in missing.values_list('household_key', *ROLLUP_FIELDS):
+            count_in_rollups(dict(zip(ROLLUP_FIELDS, values)), -1)
+            touched_households.add(household)
+        summary['deleted'] += missing.delete()[0]
+        unindex_voters(ids)
+
+    # Walk the table and the seen ids in id order; whatever the file did not mention is gone
+    seen_ids = iter(sorted(seen_ids))
+    next_seen = next(seen_ids, None)
+    missing = []
+    for pk in Voter.objects.order_by('id').values_list('id', flat=True).iterator():
+        while next_seen is not None and next_seen < pk:
+            next_seen = next(seen_ids, None)
+        if pk != next_seen:
+            missing.append(pk)
+        if len(missing) >= LOOKUP_BATCH_SIZE:
+            delete_voters(missing)
+            missing = []
+    if missing:
+        delete_voters(missing)
+
+    if summary['duplicate']:
+        print(f"Dropped {summary['duplicate']} rows repeating an earlier voter's name, "
+              f"date of birth and date of registration")
+
+    for rollup, deltas in rollup_deltas.items():
+        rollup.apply_deltas(deltas)
+    Household.rebuild(touched_households)
+    return summary
+
+def save_voter_snapshot():
+    """
+    Save the committed roll as a binary snapshot (see snapshot.py).
+    """
+    # Imported here: snapshot builds on this module
+    from .snapshot import save_snapshot
+    snapshot = save_snapshot()
+    print(f'Saved voter snapshot v{snapshot.version} to {snapshot.path}.')
+
+def load_data(filename=VOTER_CSV, chunk_size=LOAD_CHUNK_SIZE, incremental=False):
+    """
+    Load voter data from a CSV file into the Voter model.
+
+    The file is parsed and written `chunk_size` rows at a time, so memory use
+    does not grow with the size of the roll, and everything runs in a single
+    transaction: readers keep seeing the previous roll until the load commits,
+    and a failed load leaves it untouched.
+
+    By default the table is replaced. With incremental=True only the voters
+    that were added, changed or removed since the last load are written;
+    unchanged voters keep their primary key (and voter_detail URL).
+
+    With VOTER_ANALYTICS_SNAPSHOT on, the new roll is also saved as a binary
+    snapshot once committed, for the web workers to map (see snapshot.py).
+    """
+    start = time.perf_counter()
+
+    with transaction.atomic():
+        if incremental:
+            summary = apply_voter_changes(filename, chunk_size)
+        else:
+            summary = replace_voters(filename, chunk_size)
+        changed = not incremental or summary['created'] or summary['updated'] or summary['deleted']
+        if changed:
+            DataVersion.bump()
+            if getattr(settings, 'VOTER_ANALYTICS_SNAPSHOT', False):
+                # Only once the load is committed: this block may be a
+                # savepoint in a caller's transaction that is rolled back
+                transaction.on_commit(save_voter_snapshot)
+
+    elapsed = time.perf_counter() - start
+    rows = sum(summary.values())
+    rate = rows / elapsed if elapsed else 0
+    changes = ', '.join(f'{count} {change}' for change, count in summary.items())
+    report = f'Done. {changes} Voter records in {elapsed:.1f}s ({rate:,.0f} rows/sec'
+    peak = peak_memory_mb()
+    if peak is not None:
+        report += f', peak memory {peak:.0f} MB'
+    print(report + ').')
+    return summary
@@ -0,0 +1,152 @@
+# voter_analytics/pagination.py
+
+import base64
+import json
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+from .cache import result_cache
+from .models import Voter
+
+
+def cached_voter_count(filters, qs):
+    """
+    COUNT(*) of a filtered voter queryset, cached per filter combination
+    until the next load_data.
+    """
+    return result_cache.get_or_compute('count', filters, qs.count)
+
+
+class VoterIdResults:
+    """
+    Lazy sequence of Voter objects for a list of ids (from the snapshot or a
+    search), usable wherever ListView expects a queryset. Only the slice
+    being displayed is fetched.
+    """
+
+    def __init__(self, ids):
+        self.ids = ids
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        page_ids = [int(pk) for pk in self.ids[index]]
+        voters = Voter.objects.in_bulk(page_ids)
+        return [voters[pk] for pk in page_ids if pk in voters]
+
+
+class CountedPaginator(Paginator):
+    """
+    Paginator that uses a count worked out elsewhere instead of running its own.
+    """
+
+    def __init__(self, object_list, per_page, count, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self._count = count
+
+    @cached_property
+    def count(self):
+        return self._count
+
+
+def encode_cursor(voter, number):
+    """
+    Opaque token for the position of `voter` in list order, landing on page `number`.
+    """
+    position = [voter.last_name, voter.first_name, voter.pk, number]
+    return base64.urlsafe_b64encode(json.dumps(position).encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(token):
+    """
+    Return (last_name, first_name, id, page number), or None for a bad token.
+    """
+    try:
+        last_name, first_name, pk, number = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+        return str(last_name), str(first_name), int(pk), max(int(number), 1)
+    except (ValueError, TypeError, UnicodeError):
+        return None
+
+
+class KeysetPage:
+    """
+    One page of voters found by seeking on (last_name, first_name, id).
+
+    Quacks like django.core.paginator.Page for the template: number,
+    has_next(), has_previous() and paginator.count / num_pages.
+    """
+
+    def __init__(self, object_list, number, count, per_page, has_next, has_previous):
+        self.object_list = object_list
+        self.number = number
+        self.paginator = CountedPaginator([], per_page, count)
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __str__(self):
+        return f'<Page {self.number} of {self.paginator.num_pages}>'
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    @property
+    def next_cursor(self):
+        if not (self._has_next and self.object_list):
+            return None
+        return encode_cursor(self.object_list[-1], self.number + 1)
+
+    @property
+    def previous_cursor(self):
+        if not (self._has_previous and self.object_list):
+            return None
+        return encode_cursor(self.object_list[0], self.number - 1)
+
+
+def keyset_page(qs, after=None, before=None, per_page=100, count=0):
+    """
+    Fetch the page after (or before) a cursor from a voter queryset.
+
+    The seek predicate starts an index range scan at the cursor position on
+    voter_list_order_idx, so the cost of a page does not depend on how deep
+    it is, unlike OFFSET.
+    """
+    position = decode_cursor(before or after or '')
+    if position is None:
+        voters = list(qs.order_by('last_name', 'first_name', 'id')[:per_page + 1])
+        return KeysetPage(voters[:per_page], 1, count, per_page,
+                          has_next=len(voters) > per_page, has_previous=False)
+
+    last_name, first_name, pk, number = position
+    if before:
+        # Walk backwards from the cursor, then put the page back in list order
+        seek = Q(last_name__lte=last_name) & (
+            Q(last_name__lt=last_name)
+            | Q(first_name__lt=first_name)
+            | Q(first_name=first_name, id__lt=pk)
+        )
+        voters = list(qs.filter(seek).order_by('-last_name', '-first_name', '-id')[:per_page + 1])
+        has_previous = len(voters) > per_page
+        voters = voters[:per_page][::-1]
+        return KeysetPage(voters, number, count, per_page,
+                          has_next=True, has_previous=has_previous)
+
+    seek = Q(last_name__gte=last_name) & (
+        Q(last_name__gt=last_name)
+        | Q(first_name__gt=first_name)
+        | Q(first_name=first_name, id__gt=pk)
+    )
+    voters = list(qs.filter(seek).order_by('last_name', 'first_name', 'id')[:per_page + 1])
+    return KeysetPage(voters[:per_page], number, count, per_page,
+                      has_next=len(voters) > per_page, has_previous=True)
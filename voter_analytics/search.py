@@ -0,0 +1,68 @@
+# voter_analytics/search.py
+
+import re
+from django.db.models import Q
+from .analytics import filter_voters
+from .models import SEARCH_TABLE, Voter, search_index_available
+
+# Best matches kept for a search; more than anyone pages through
+SEARCH_LIMIT = 1000
+
+# Words of a search, each optionally ending in * to match as a prefix
+TERM_RE = re.compile(r'(\w+)(\*?)')
+
+
+def search_terms(text):
+    """
+    [(word, is_prefix)] for the words in a search box value.
+    """
+    return [(word, bool(star)) for word, star in TERM_RE.findall(text or '')]
+
+
+def fts_query(terms):
+    """
+    FTS5 MATCH expression requiring every term. Words are quoted, so no
+    user input can turn into FTS5 syntax (or a syntax error).
+    """
+    return ' '.join(f'"{word}"*' if prefix else f'"{word}"' for word, prefix in terms)
+
+
+def search_voters(text, filters):
+    """
+    Queryset of the voters whose first name, last name, street name or zip
+    code match every word of `text` and who pass the parsed filters, best
+    match first, without a limit. "Smi*" matches any word starting with Smi.
+    """
+    terms = search_terms(text)
+    qs = filter_voters(filters)
+    if not terms:
+        return qs.none()
+
+    if not search_index_available():
+        # Without FTS5, match each word against the start of the fields
+        for word, prefix in terms:
+            lookup = 'istartswith' if prefix else 'iexact'
+            qs = qs.filter(
+                Q(**{f'first_name__{lookup}': word})
+                | Q(**{f'last_name__{lookup}': word})
+                | Q(**{f'residential_address_street_name__{lookup}': word})
+                | Q(**{f'residential_address_zip_code__{lookup}': word})
+            )
+        return qs.order_by('last_name', 'first_name', 'id')
+
+    # The MATCH drives the query: each hit is joined to its voter row by
+    # primary key, filtered, and ordered by the FTS5 bm25 rank
+    return qs.extra(
+        tables=[SEARCH_TABLE],
+        where=[f'{SEARCH_TABLE}.rowid = {Voter._meta.db_table}.id', f'{SEARCH_TABLE} MATCH %s'],
+        params=[fts_query(terms)],
+        order_by=[f'{SEARCH_TABLE}.rank'],
+    )
+
+
+def search_voter_ids(text, filters):
+    """
+    Ids of the search_voters matches, best match first, at most SEARCH_LIMIT
+    of them (for the voter list; exports use search_voters directly).
+    """
+    return list(search_voters(text, filters).values_list('id', flat=True)[:SEARCH_LIMIT])
@@ -0,0 +1,403 @@
+# voter_analytics/snapshot.py
+
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import numpy as np
+from django.conf import settings
+from .models import ELECTION_BITS, PARTY_NAMES, DataVersion, Voter, participation_mask
+from .pagination import VoterIdResults
+
+logger = logging.getLogger(__name__)
+
+# Rows fetched per database round trip while building
+BUILD_CHUNK_SIZE = 20000
+
+# Where snapshots are written when VOTER_ANALYTICS_SNAPSHOT_DIR is not set
+DEFAULT_SNAPSHOT_DIR = os.path.join(settings.BASE_DIR, 'voter_analytics', 'data', 'snapshots')
+
+# Bumped whenever the files change layout; older snapshots are rebuilt
+SNAPSHOT_FORMAT = 1
+
+# Snapshot versions kept on disk; workers may still have an older one mapped
+SNAPSHOTS_KEPT = 2
+
+# Per-voter columns, with the dtype each is stored in. The string columns
+# hold indices into the snapshot's string table.
+NUMERIC_COLUMNS = {
+    'ids': np.int32,
+    'birth_years': np.int16,
+    'party_codes': np.uint8,
+    'precinct_codes': np.uint16,
+    'voter_scores': np.int8,
+    'election_flags': np.min_scalar_type((1 << len(ELECTION_BITS)) - 1),
+    'dates_of_birth': 'datetime64[D]',
+    'dates_of_registration': 'datetime64[D]',
+}
+STRING_COLUMNS = {
+    'last_names': 'last_name',
+    'first_names': 'first_name',
+    'street_numbers': 'residential_address_street_number',
+    'street_names': 'residential_address_street_name',
+    'apartments': 'residential_address_apartment_number',
+    'zip_codes': 'residential_address_zip_code',
+}
+
+
+def snapshot_dir():
+    return getattr(settings, 'VOTER_ANALYTICS_SNAPSHOT_DIR', DEFAULT_SNAPSHOT_DIR)
+
+
+class StringTable:
+    """
+    Distinct strings packed into one UTF-8 byte array, with the offset of
+    each string's start (and one past the last string's end). Names and
+    streets repeat a lot, so each is stored once and columns hold indices.
+    """
+
+    def __init__(self, offsets, data):
+        self.offsets = offsets
+        self.data = data
+
+    @classmethod
+    def build(cls, strings):
+        encoded = [string.encode('utf-8') for string in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(string) for string in encoded], out=offsets[1:])
+        data = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+        return cls(offsets, data)
+
+    def __getitem__(self, index):
+        return self.data[self.offsets[index]:self.offsets[index + 1]].tobytes().decode('utf-8')
+
+    @property
+    def nbytes(self):
+        return self.offsets.nbytes + self.data.nbytes
+
+
+class SnapshotVoter:
+    """
+    One voter read from a snapshot, with the attributes the voter list shows.
+    """
+
+    def __init__(self, snapshot, row):
+        strings = snapshot.strings
+        self.pk = self.id = int(snapshot.ids[row])
+        for column, field in STRING_COLUMNS.items():
+            setattr(self, field, strings[snapshot.columns[column][row]])
+        # The string table has no NULL; a missing apartment is stored empty
+        self.residential_address_apartment_number = self.residential_address_apartment_number or None
+        self.date_of_birth = snapshot.dates_of_birth[row].item()
+        self.date_of_registration = snapshot.dates_of_registration[row].item()
+        self.party = int(snapshot.party_codes[row])
+        self.voter_score = int(snapshot.voter_scores[row])
+
+    @property
+    def party_affiliation(self):
+        return PARTY_NAMES.get(self.party, self.party)
+
+    def __str__(self):
+        return f'{self.first_name} {self.last_name}'
+
+
+class SnapshotVoters(VoterIdResults):
+    """
+    Lazy sequence of the voters at some snapshot rows, read straight from
+    the snapshot columns without touching the database.
+    """
+
+    def __init__(self, snapshot, rows):
+        super().__init__(snapshot.ids[rows])
+        self.snapshot = snapshot
+        self.rows = rows
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return SnapshotVoter(self.snapshot, self.rows[index])
+        return [SnapshotVoter(self.snapshot, row) for row in self.rows[index]]
+
+
+class VoterSnapshot:
+    """
+    Read-only columnar copy of the Voter table held in NumPy arrays.
+
+    Rows are stored in voter list order (last name, first name, id), so a
+    filter mask maps straight onto a page of voters. Party is kept as its
+    stored code, precincts as small integer codes into a lookup list,
+    election participation as the same bitmask the table uses, dates as
+    days, and names and addresses as indices into a string table.
+
+    A snapshot is saved as one .npy file per column plus a JSON header, in a
+    directory per DataVersion. Loading maps the files read-only instead of
+    reading them, so it takes milliseconds, and every gunicorn worker that
+    maps the same snapshot shares its pages through the OS page cache.
+    """
+
+    def __init__(self, version, columns, strings, precinct_names, build_seconds, path=None):
+        self.version = version
+        self.columns = columns
+        self.strings = strings
+        self.precinct_names = precinct_names
+        self.build_seconds = build_seconds
+        self.path = path
+        for name, column in columns.items():
+            setattr(self, name, column)
+
+    @classmethod
+    def build(cls):
+        """
+        Read the Voter table in chunks and pack it into arrays.
+        """
+        start = time.perf_counter()
+        version = DataVersion.current()
+        count = Voter.objects.count()
+
+        columns = {name: np.empty(count, dtype=dtype) for name, dtype in NUMERIC_COLUMNS.items()}
+        columns.update((name, np.empty(count, dtype=np.uint32)) for name in STRING_COLUMNS)
+        precinct_lookup = {}
+        string_lookup = {}
+
+        rows = (
+            Voter.objects.order_by('last_name', 'first_name', 'id')
+            .values_list('id', 'birth_year', 'party', 'precinct_number', 'voter_score', 'participation',
+                         'date_of_birth', 'date_of_registration', *STRING_COLUMNS.values())
+            .iterator(chunk_size=BUILD_CHUNK_SIZE)
+        )
+        i = -1
+        for i, (pk, birth_year, party, precinct, voter_score, participation,
+                date_of_birth, date_of_registration, *strings) in enumerate(rows):
+            if i >= count:
+                break  # Rows added after the count; they show up on the next build
+            columns['ids'][i] = pk
+            columns['birth_years'][i] = birth_year
+            columns['party_codes'][i] = party
+            columns['precinct_codes'][i] = precinct_lookup.setdefault(precinct, len(precinct_lookup))
+            columns['voter_scores'][i] = voter_score
+            columns['election_flags'][i] = participation
+            columns['dates_of_birth'][i] = date_of_birth
+            columns['dates_of_registration'][i] = date_of_registration
+            for name, value in zip(STRING_COLUMNS, strings):
+                columns[name][i] = string_lookup.setdefault(value or '', len(string_lookup))
+
+        size = i + 1
+        return cls(
+            version=version,
+            columns={name: column[:size] for name, column in columns.items()},
+            strings=StringTable.build(string_lookup),
+            precinct_names=list(precinct_lookup),
+            build_seconds=time.perf_counter() - start,
+        )
+
+    def save(self, directory):
+        """
+        Write the snapshot under `directory`, in a subdirectory named after
+        its version, and return that path. Files are written to a temporary
+        directory that is renamed into place, so readers never see a partly
+        written snapshot. An existing directory for the same version is
+        replaced: it may hold a load that was rolled back, whose version
+        number was then reused.
+        """
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'v{self.version}')
+        tmp = tempfile.mkdtemp(prefix=f'.v{self.version}-', dir=directory)
+        try:
+            for name, column in self.columns.items():
+                np.save(os.path.join(tmp, f'{name}.npy'), column)
+            np.save(os.path.join(tmp, 'string_offsets.npy'), self.strings.offsets)
+            np.save(os.path.join(tmp, 'string_data.npy'), self.strings.data)
+            with open(os.path.join(tmp, 'snapshot.json'), 'w', encoding='utf-8') as f:
+                json.dump({
+                    'format': SNAPSHOT_FORMAT,
+                    'version': self.version,
+                    'voters': len(self),
+                    'precinct_names': self.precinct_names,
+                }, f)
+            try:
+                os.rename(tmp, path)
+            except OSError:
+                # Move the old copy aside first; rename won't replace a non-empty directory
+                old = tempfile.mkdtemp(prefix=f'.v{self.version}-old-', dir=directory)
+                os.rename(path, os.path.join(old, 'snapshot'))
+                os.rename(tmp, path)
+                shutil.rmtree(old, ignore_errors=True)
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+        return path
+
+    @classmethod
+    def load(cls, path):
+        """
+        Map a saved snapshot read-only. Returns None if `path` holds no
+        snapshot in the current format.
+        """
+        start = time.perf_counter()
+        try:
+            with open(os.path.join(path, 'snapshot.json'), encoding='utf-8') as f:
+                header = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if header.get('format') != SNAPSHOT_FORMAT:
+            return None
+
+        def load_array(name):
+            return np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r')
+
+        return cls(
+            version=header['version'],
+            columns={name: load_array(name) for name in [*NUMERIC_COLUMNS, *STRING_COLUMNS]},
+            strings=StringTable(load_array('string_offsets'), load_array('string_data')),
+            precinct_names=header['precinct_names'],
+            build_seconds=time.perf_counter() - start,
+            path=path,
+        )
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def nbytes(self):
+        """
+        Size of the column arrays and string table in bytes.
+        """
+        return sum(column.nbytes for column in self.columns.values()) + self.strings.nbytes
+
+    def mask(self, filters):
+        """
+        Translate parsed filters (see analytics.parse_filters) into a boolean
+        mask over the rows.
+        """
+        mask = np.ones(len(self), dtype=bool)
+
+        if filters['party'] is not None:
+            mask &= self.party_codes == filters['party']
+
+        if filters['min_year'] is not None:
+            mask &= self.birth_years >= filters['min_year']
+
+        if filters['max_year'] is not None:
+            mask &= self.birth_years <= filters['max_year']
+
+        if filters['voter_score'] is not None:
+            mask &= self.voter_scores == filters['voter_score']
+
+        if filters['elections']:
+            required = participation_mask(filters['elections'])
+            mask &= (self.election_flags & required) == required
+
+        return mask
+
+    def matching_ids(self, filters):
+        """
+        Ids of the voters matching the filters, in voter list order.
+        """
+        return self.ids[self.mask(filters)]
+
+    def matching_voters(self, filters):
+        """
+        The voters matching the filters, in voter list order, as a lazy
+        sequence read from the snapshot.
+        """
+        return SnapshotVoters(self, np.flatnonzero(self.mask(filters)))
+
+    def aggregates(self, filters):
+        """
+        Same result as analytics.voter_aggregates, computed with bincount
+        over the masked columns.
+        """
+        mask = self.mask(filters)
+
+        birth_years = {}
+        years = self.birth_years[mask]
+        if len(years):
+            first_year = int(years.min())
+            for offset, voters in enumerate(np.bincount(years - first_year)):
+                if voters:
+                    birth_years[first_year + offset] = int(voters)
+
+        party_counts = np.bincount(self.party_codes[mask])
+        parties = {
+            PARTY_NAMES[code]: int(voters)
+            for code, voters in enumerate(party_counts) if voters
+        }
+
+        flags = self.election_flags[mask]
+        elections = {
+            election: int(np.count_nonzero(flags & bit))
+            for election, bit in ELECTION_BITS.items()
+        }
+
+        return {'birth_years': birth_years, 'parties': parties, 'elections': elections}
+
+
+def save_snapshot():
+    """
+    Build a snapshot of the current roll and save it to the snapshot
+    directory, removing all but the newest SNAPSHOTS_KEPT versions. Called
+    by load_data once a load commits (never before: a rolled back load
+    would leave a snapshot of data that doesn't exist). Returns the saved
+    snapshot, mapped from disk.
+    """
+    directory = snapshot_dir()
+    snapshot = VoterSnapshot.build()
+    path = snapshot.save(directory)
+
+    versions = sorted(
+        (int(name[1:]) for name in os.listdir(directory) if name[:1] == 'v' and name[1:].isdigit()),
+        reverse=True,
+    )
+    for version in versions[SNAPSHOTS_KEPT:]:
+        # Workers still mapping an old snapshot keep their pages until they unmap
+        shutil.rmtree(os.path.join(directory, f'v{version}'), ignore_errors=True)
+    return VoterSnapshot.load(path)
+
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+
+
+def snapshot_enabled():
+    return getattr(settings, 'VOTER_ANALYTICS_SNAPSHOT', False)
+
+
+def get_snapshot():
+    """
+    Return an up-to-date snapshot, mapping the one load_data saved for the
+    current data version on first use and again after every load. Returns
+    None when the snapshot is disabled.
+    """
+    global _snapshot
+    if not snapshot_enabled():
+        return None
+
+    version = DataVersion.current()
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.version == version:
+        return snapshot
+
+    with _snapshot_lock:
+        # Another thread may have loaded it while we waited for the lock
+        if _snapshot is None or _snapshot.version != version:
+            _snapshot = VoterSnapshot.load(os.path.join(snapshot_dir(), f'v{version}'))
+            if _snapshot is not None and len(_snapshot) != Voter.objects.count():
+                # Saved for a load that was rolled back and whose version
+                # number was reused: don't serve it
+                _snapshot = None
+            if _snapshot is not None:
+                logger.info(
+                    'Mapped voter snapshot v%s: %d voters, %.1f MB in %.1fms',
+                    _snapshot.version, len(_snapshot), _snapshot.nbytes / 1e6, _snapshot.build_seconds * 1000,
+                )
+            else:
+                # No usable snapshot for this version yet (loaded before
+                # snapshots were written, the files were removed, or they
+                # belong to a rolled back load): build it once, and save it
+                # for the other workers
+                _snapshot = save_snapshot()
+                logger.info('Built voter snapshot v%s: %d voters, %.1f MB',
+                            _snapshot.version, len(_snapshot), _snapshot.nbytes / 1e6)
+        return _snapshot
+
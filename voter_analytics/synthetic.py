@@ -0,0 +1,94 @@
+# voter_analytics/synthetic.py
+
+import csv
+import datetime
+import random
+from .models import CSV_COLUMNS, ELECTION_BITS, PARTY_CODES, PARTY_MAP, Voter, format_voter, participation_mask
+
+# Rough shape of the Newton roll: mostly Democrats and Unaffiliated voters,
+# a solid Republican minority and a long tail of small parties.
+PARTY_WEIGHTS = {'D': 40, 'U': 38, 'R': 12, 'L': 1, 'G': 1, 'X': 1}
+MINOR_PARTY_WEIGHT = 7 / (len(PARTY_MAP) - len(PARTY_WEIGHTS))
+
+FIRST_NAMES = ['James', 'Mary', 'John', 'Patricia', 'Robert', 'Jennifer', 'Michael', 'Linda',
+               'David', 'Elizabeth', 'William', 'Susan', 'Richard', 'Jessica', 'Wei', 'Priya']
+LAST_NAMES = ['Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis',
+              'Cohen', 'Murphy', 'Sullivan', 'Chen', 'Wang', 'Kelly', 'Rodriguez', 'Lee']
+STREETS = ['Commonwealth Ave', 'Beacon St', 'Walnut St', 'Centre St', 'Washington St',
+           'Chestnut St', 'Highland St', 'Lowell Ave', 'Boylston St', 'Dedham St']
+ZIP_CODES = ['02458', '02459', '02460', '02461', '02462', '02464', '02465', '02466', '02467', '02468']
+
+
+def parse_row_count(value):
+    """
+    Parse a roll size such as 10000, 10k or 5M (an argparse type).
+    """
+    multipliers = {'k': 1_000, 'm': 1_000_000}
+    value = value.strip().lower().replace('_', '')
+    multiplier = multipliers.get(value[-1:], 1)
+    if multiplier != 1:
+        value = value[:-1]
+    try:
+        count = int(float(value) * multiplier)
+    except ValueError:
+        raise ValueError(f'Not a row count: {value!r}')
+    if count < 1:
+        raise ValueError('Row count must be positive')
+    return count
+
+
+def synthetic_voters(count, seed=0):
+    """
+    Yield `count` unsaved, deterministic Voter instances for benchmarks.
+    The same seed always produces the same roll.
+    """
+    rng = random.Random(seed)
+    codes = list(PARTY_MAP)
+    weights = [PARTY_WEIGHTS.get(code, MINOR_PARTY_WEIGHT) for code in codes]
+
+    for i in range(count):
+        # Birth years cluster around the 1960s-80s with a long tail either way
+        birth_year = min(2005, max(1920, int(rng.gauss(1970, 18))))
+        date_of_birth = datetime.date(birth_year, rng.randint(1, 12), rng.randint(1, 28))
+        registration_year = rng.randint(min(birth_year + 18, 2023), 2023)
+
+        # Older voters turn out more often; voter_score is the number of elections voted in
+        turnout = 0.35 + (2005 - birth_year) / 170
+        votes = [rng.random() < turnout for _ in ELECTION_BITS]
+
+        voter = Voter(
+            last_name=rng.choice(LAST_NAMES),
+            first_name=rng.choice(FIRST_NAMES),
+            residential_address_street_number=str(rng.randint(1, 2000)),
+            residential_address_street_name=rng.choice(STREETS),
+            residential_address_apartment_number=str(rng.randint(1, 40)) if rng.random() < 0.3 else None,
+            residential_address_zip_code=rng.choice(ZIP_CODES),
+            date_of_birth=date_of_birth,
+            date_of_registration=datetime.date(registration_year, rng.randint(1, 12), rng.randint(1, 28)),
+            party=PARTY_CODES[PARTY_MAP[rng.choices(codes, weights)[0]]],
+            precinct_number=str(rng.randint(1, 32)),
+            participation=participation_mask(
+                election for election, voted in zip(ELECTION_BITS, votes) if voted
+            ),
+            voter_score=sum(votes),
+        )
+        voter.refresh_derived_fields()
+        # Random names and dates can repeat, so key synthetic voters by position
+        voter.set_change_keys(identity=f'synthetic-{seed}-{i}')
+        yield voter
+
+
+def write_synthetic_csv(filename, count, seed=0):
+    """
+    Write a deterministic synthetic roll of `count` voters to `filename` in
+    the newton_voters.csv layout, ready for load_data. Rows are generated and
+    written one at a time, so any size fits in memory.
+
+    Voters are keyed by name and dates once loaded, so the rare row that
+    repeats an earlier one is dropped by load_data like any duplicate.
+    """
+    with open(filename, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_COLUMNS)
+        for voter in synthetic_voters(count, seed):
+            writer.writerow(format_voter(voter))
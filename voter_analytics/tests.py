@@ -1,3 +1,448 @@
-from django.test import TestCase
+# voter_analytics/tests.py
 
-# Create your tests here.
+import contextlib
+import csv
+import io
+import os
+import re
+import tempfile
+from unittest import mock
+from django.db import connection, transaction
+from django.http import QueryDict
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from . import snapshot
+from .analytics import (
+    add_turnout, cohort_aggregates, filter_voters, parse_cohorts, parse_filters, voter_aggregates,
+)
+from .cache import FilterResultCache
+from .models import (
+    ELECTION_BITS, ROLLUPS, SEARCH_COLUMNS, SEARCH_TABLE, DataVersion, Household, Voter, VoterCube, load_data,
+    search_index_available,
+)
+from .pagination import keyset_page
+from .search import search_voter_ids, search_voters
+from .synthetic import write_synthetic_csv
+
+
+def quiet_load(filename, **kwargs):
+    """
+    load_data without its progress report.
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        return load_data(filename, **kwargs)
+
+
+class SyntheticRollTestCase(TestCase):
+    """
+    Base for tests working on small synthetic rolls written to a temporary
+    directory.
+    """
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def write_roll(self, name, count, seed):
+        filename = os.path.join(self.tmp.name, name)
+        write_synthetic_csv(filename, count, seed=seed)
+        return filename
+
+    def read_rows(self, filename):
+        with open(filename, encoding='utf-8', newline='') as f:
+            return list(csv.DictReader(f))
+
+    def write_rows(self, name, rows):
+        filename = os.path.join(self.tmp.name, name)
+        with open(filename, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+        return filename
+
+
+class KeysetPaginationTests(SyntheticRollTestCase):
+
+    def setUp(self):
+        super().setUp()
+        # Synthetic names repeat a lot, so pages split runs of equal names
+        quiet_load(self.write_roll('roll.csv', 230, seed=1))
+        self.qs = Voter.objects.all()
+        self.count = self.qs.count()
+        self.expected = [
+            pk for *name, pk in sorted(self.qs.values_list('last_name', 'first_name', 'id'))
+        ]
+
+    def walk_forward(self, per_page):
+        pages = [keyset_page(self.qs, per_page=per_page, count=self.count)]
+        while pages[-1].next_cursor:
+            pages.append(keyset_page(self.qs, after=pages[-1].next_cursor, per_page=per_page, count=self.count))
+        return pages
+
+    def test_next_pages_cover_the_list_in_order(self):
+        pages = self.walk_forward(per_page=17)
+        self.assertEqual([voter.pk for page in pages for voter in page], self.expected)
+        self.assertEqual([page.number for page in pages], list(range(1, len(pages) + 1)))
+        self.assertEqual(len(pages), pages[0].paginator.num_pages)
+        self.assertFalse(pages[0].has_previous())
+        self.assertFalse(pages[-1].has_next())
+
+    def test_previous_pages_retrace_the_next_pages(self):
+        forward = self.walk_forward(per_page=17)
+        backward = [forward[-1]]
+        while backward[-1].previous_cursor:
+            backward.append(
+                keyset_page(self.qs, before=backward[-1].previous_cursor, per_page=17, count=self.count)
+            )
+        backward.reverse()
+        self.assertEqual(
+            [[voter.pk for voter in page] for page in backward],
+            [[voter.pk for voter in page] for page in forward],
+        )
+        self.assertEqual([page.number for page in backward], [page.number for page in forward])
+        self.assertFalse(backward[0].has_previous())
+
+    def test_bad_cursor_starts_at_the_first_page(self):
+        page = keyset_page(self.qs, after='not a cursor', per_page=17, count=self.count)
+        self.assertEqual(page.number, 1)
+        self.assertEqual([voter.pk for voter in page], self.expected[:17])
+
+
+class IncrementalLoadTests(SyntheticRollTestCase):
+    """
+    An incremental load must leave every derived table exactly as a full
+    load of the same file does.
+    """
+
+    def changed_roll(self, base):
+        """
+        A copy of the base roll with voters removed, changed (party,
+        elections, street number and name) and added.
+        """
+        rows = []
+        for i, row in enumerate(self.read_rows(base)):
+            if i % 10 == 0:
+                continue
+            if i % 7 == 0:
+                row['Party Affiliation'] = 'R' if row['Party Affiliation'].strip() != 'R' else 'D'
+                election = list(ELECTION_BITS)[i % len(ELECTION_BITS)]
+                row[election] = 'FALSE' if row[election] == 'TRUE' else 'TRUE'
+            if i % 11 == 0:
+                # Moves the voter to another household
+                row['Residential Address - Street Number'] = str(int(row['Residential Address - Street Number']) + 1)
+            if i % 13 == 0:
+                # Changes a searched column as well as the household
+                row['Residential Address - Street Name'] = 'Walnut Park'
+            rows.append(row)
+        rows.extend(self.read_rows(self.write_roll('new.csv', 40, seed=3)))
+        return self.write_rows('changed.csv', rows)
+
+    def derived_state(self):
+        """
+        Rollup rows, households and the search index, keyed so they don't
+        depend on voter primary keys.
+        """
+        state = {
+            rollup.__name__: sorted((row.key(), row.voters) for row in rollup.objects.all())
+            for rollup in ROLLUPS
+        }
+        state['households'] = sorted(
+            Household.objects.values_list(
+                'key', 'street_number', 'street_name', 'apartment', 'zip_code',
+                'size', 'party_counts', 'election_counts',
+            ),
+            key=lambda household: household[0],
+        )
+        if search_index_available():
+            columns = ', '.join(f'{SEARCH_TABLE}.{column}' for column in SEARCH_COLUMNS)
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'SELECT voter.natural_key, {columns} FROM {SEARCH_TABLE} '
+                    f'JOIN {Voter._meta.db_table} voter ON voter.id = {SEARCH_TABLE}.rowid'
+                )
+                state['search'] = sorted(cursor.fetchall())
+                cursor.execute(f'SELECT COUNT(*) FROM {SEARCH_TABLE}')
+                state['search_rows'] = cursor.fetchone()[0]
+        return state
+
+    def test_incremental_load_matches_full_rebuild(self):
+        base = self.write_roll('base.csv', 300, seed=2)
+        changed = self.changed_roll(base)
+
+        quiet_load(base)
+        summary = quiet_load(changed, incremental=True)
+        self.assertGreater(summary['created'], 0)
+        self.assertGreater(summary['updated'], 0)
+        self.assertGreater(summary['deleted'], 0)
+        incremental = self.derived_state()
+
+        quiet_load(changed)
+        self.assertEqual(incremental, self.derived_state())
+
+    def test_unchanged_file_changes_nothing(self):
+        base = self.write_roll('base.csv', 120, seed=4)
+        quiet_load(base)
+        before = self.derived_state()
+        summary = quiet_load(base, incremental=True)
+        self.assertEqual(summary['unchanged'], Voter.objects.count())
+        self.assertEqual(summary['created'] + summary['updated'] + summary['deleted'], 0)
+        self.assertEqual(before, self.derived_state())
+
+    def roll_with_duplicate(self):
+        """
+        A roll where one voter appears twice, first as a Democrat and then,
+        at the end, as a Republican. Returns the file and the first row.
+        """
+        rows = self.read_rows(self.write_roll('base.csv', 60, seed=5))
+        rows[3]['Party Affiliation'] = 'D'
+        rows.append(dict(rows[3], **{'Party Affiliation': 'R'}))
+        return self.write_rows('duplicate.csv', rows), rows[3]
+
+    def test_duplicate_keeps_the_first_row_in_both_modes(self):
+        roll, row = self.roll_with_duplicate()
+        summary = quiet_load(roll)
+        self.assertEqual(summary['duplicate'], 1)
+        before = self.derived_state()
+
+        # One chunk, then 7 rows per chunk so the repeat lands in a later chunk
+        for chunk_size in (5000, 7):
+            summary = quiet_load(roll, incremental=True, chunk_size=chunk_size)
+            self.assertEqual(summary['duplicate'], 1)
+            self.assertEqual(summary['created'] + summary['updated'] + summary['deleted'], 0)
+            voter = Voter.objects.get(
+                last_name=row['Last Name'], first_name=row['First Name'],
+                date_of_birth=row['Date of Birth'], date_of_registration=row['Date of Registration'],
+            )
+            self.assertEqual(voter.party_affiliation, 'Democrat')
+            self.assertEqual(before, self.derived_state())
+
+
+class HouseholdTests(SyntheticRollTestCase):
+
+    def households(self):
+        return sorted(Household.objects.values_list(
+            'key', 'street_number', 'street_name', 'apartment', 'zip_code', 'size', 'party_counts',
+            'election_counts',
+        ))
+
+    def test_sql_rebuild_matches_folding_voters_in_python(self):
+        quiet_load(self.write_roll('roll.csv', 300, seed=13))
+        rebuilt = self.households()
+        self.assertEqual(sum(household[5] for household in rebuilt), Voter.objects.count())
+
+        Household.objects.all().delete()
+        Household._fold_from(Voter.objects.all())
+        self.assertEqual(rebuilt, self.households())
+
+    def test_rebuilding_some_keys_leaves_the_others(self):
+        quiet_load(self.write_roll('roll.csv', 200, seed=14))
+        before = self.households()
+        keys = [household[0] for household in before[::3]]
+        Voter.objects.filter(household_key=keys[0]).delete()
+        Household.rebuild(keys)
+        self.assertEqual(self.households(), [household for household in before if household[0] != keys[0]])
+
+
+class CohortComparisonTests(SyntheticRollTestCase):
+    """
+    Each cohort of a comparison must add up to what voter_aggregates gives
+    for its filters alone.
+    """
+
+    def setUp(self):
+        super().setUp()
+        quiet_load(self.write_roll('roll.csv', 400, seed=6))
+
+    def assert_cohorts_match(self, query):
+        cohorts = parse_cohorts(QueryDict(query))
+        for qs in (Voter.objects.all(), VoterCube.objects.all()):
+            with self.subTest(query=query, model=qs.model.__name__):
+                self.assertEqual(
+                    cohort_aggregates(qs, cohorts),
+                    [add_turnout(voter_aggregates(filter_voters(filters, qs))) for filters in cohorts],
+                )
+
+    def test_cohort_of_all_voters_next_to_a_filtered_one(self):
+        self.assert_cohorts_match('cohorts=2&c1-party_affiliation=Democrat')
+        results = cohort_aggregates(Voter.objects.all(), parse_cohorts(QueryDict(
+            'cohorts=2&c1-party_affiliation=Democrat'
+        )))
+        self.assertEqual(results[0]['voters'], Voter.objects.count())
+        self.assertLess(results[1]['voters'], results[0]['voters'])
+
+    def test_overlapping_filtered_cohorts(self):
+        self.assert_cohorts_match(
+            'cohorts=3&c0-party_affiliation=Democrat&c1-min_dob=1970'
+            '&c2-voter_score=2&c2-elections=v20state'
+        )
+
+
+class SearchTests(SyntheticRollTestCase):
+    """
+    A search matches the voters having every word in their first name, last
+    name, street name or zip code, whether or not the FTS5 index is used.
+    """
+
+    def setUp(self):
+        super().setUp()
+        quiet_load(self.write_roll('roll.csv', 500, seed=7))
+        self.no_filters = parse_filters(QueryDict())
+
+    def expected(self, text, qs=None):
+        """
+        Ids of the voters with a word matching each word of text, found in
+        Python.
+        """
+        qs = Voter.objects.all() if qs is None else qs
+        terms = [(word.lower(), star == '*') for word, star in re.findall(r'(\w+)(\*?)', text)]
+        fields = ('first_name', 'last_name', 'residential_address_street_name', 'residential_address_zip_code')
+        ids = set()
+        for pk, *values in qs.values_list('id', *fields):
+            words = {word.lower() for value in values for word in re.findall(r'\w+', value)}
+            if all(
+                any(word.startswith(term) for word in words) if prefix else term in words
+                for term, prefix in terms
+            ):
+                ids.add(pk)
+        return ids
+
+    def assert_search(self, text, filters=None):
+        filters = filters or self.no_filters
+        found = list(search_voters(text, filters).values_list('id', flat=True))
+        self.assertEqual(len(found), len(set(found)))
+        self.assertEqual(set(found), self.expected(text, filter_voters(filters)))
+        return found
+
+    def test_every_word_must_match(self):
+        self.assertTrue(self.assert_search('smith'))
+        both = self.assert_search('Smith Walnut')
+        self.assertTrue(both)
+        self.assertLess(len(both), len(self.assert_search('smith')))
+
+    def test_prefix_words(self):
+        self.assertGreater(len(self.assert_search('Wa*')), len(self.assert_search('Walnut')))
+
+    def test_filters_narrow_the_matches(self):
+        democrats = parse_filters(QueryDict('party_affiliation=Democrat'))
+        self.assertLess(len(self.assert_search('Smith', democrats)), len(self.assert_search('Smith')))
+
+    def test_search_syntax_is_not_interpreted(self):
+        self.assertEqual(self.assert_search('"Smith OR'), [])
+        self.assertEqual(list(search_voters('*" -', self.no_filters)), [])
+
+    def test_export_has_every_match_beyond_the_list_limit(self):
+        expected = self.expected('Smith')
+        with mock.patch('voter_analytics.search.SEARCH_LIMIT', 5):
+            self.assertEqual(len(search_voter_ids('Smith', self.no_filters)), 5)
+            response = self.client.get(reverse('export_voters'), {'q': 'Smith', 'format': 'jsonl'})
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertGreater(len(expected), 5)
+        self.assertEqual(len(lines), len(expected))
+
+
+class SnapshotTests(SyntheticRollTestCase):
+    """
+    The snapshot saved by load_data must answer like the database, and only
+    ever describe a committed roll.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.snapshot_dir = os.path.join(self.tmp.name, 'snapshots')
+        settings = override_settings(VOTER_ANALYTICS_SNAPSHOT=True, VOTER_ANALYTICS_SNAPSHOT_DIR=self.snapshot_dir)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        # Don't let a snapshot mapped by another test leak into this one
+        snapshot._snapshot = None
+        self.addCleanup(setattr, snapshot, '_snapshot', None)
+
+    def load(self, filename):
+        # The test transaction never commits, so run the on_commit callbacks
+        # (which save the snapshot) by hand
+        with contextlib.redirect_stdout(io.StringIO()), self.captureOnCommitCallbacks(execute=True):
+            return load_data(filename)
+
+    def saved_versions(self):
+        if not os.path.isdir(self.snapshot_dir):
+            return []
+        return sorted(name for name in os.listdir(self.snapshot_dir) if not name.startswith('.'))
+
+    def test_snapshot_matches_the_database(self):
+        self.load(self.write_roll('roll.csv', 300, seed=8))
+        self.assertEqual(self.saved_versions(), [f'v{DataVersion.current()}'])
+
+        mapped = snapshot.get_snapshot()
+        self.assertEqual(mapped.version, DataVersion.current())
+        self.assertEqual(len(mapped), Voter.objects.count())
+        for query in ('', 'party_affiliation=Democrat', 'min_dob=1960&max_dob=1990', 'voter_score=3&elections=v20state'):
+            with self.subTest(query=query):
+                filters = parse_filters(QueryDict(query))
+                voters = filter_voters(filters).order_by('last_name', 'first_name', 'id')
+                self.assertEqual(mapped.aggregates(filters), voter_aggregates(voters))
+                self.assertEqual(list(mapped.matching_ids(filters)), list(voters.values_list('id', flat=True)))
+
+    def test_rolled_back_load_saves_no_snapshot(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertRaises(RuntimeError):
+                with transaction.atomic():
+                    quiet_load(self.write_roll('roll.csv', 50, seed=9))
+                    raise RuntimeError('roll back the load')
+        self.assertEqual(callbacks, [])
+        self.assertEqual(self.saved_versions(), [])
+
+    def test_snapshot_not_matching_the_roll_is_rebuilt(self):
+        self.load(self.write_roll('roll.csv', 80, seed=10))
+        # As if the saved snapshot belonged to a rolled back load that had
+        # the same version number
+        Voter.objects.filter(pk__in=Voter.objects.values('pk')[:5]).delete()
+
+        mapped = snapshot.get_snapshot()
+        self.assertEqual(len(mapped), Voter.objects.count())
+        self.assertEqual(
+            sorted(mapped.ids), sorted(Voter.objects.values_list('id', flat=True)),
+        )
+
+
+class ResultCacheTests(SyntheticRollTestCase):
+    """
+    Cached results are shared by equivalent filters and dropped as soon as a
+    load changes the roll.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.base = self.write_roll('base.csv', 100, seed=11)
+        quiet_load(self.base)
+        self.cache = FilterResultCache(max_entries=8)
+        self.computed = 0
+
+    def count(self, query):
+        filters = parse_filters(QueryDict(query))
+
+        def compute():
+            self.computed += 1
+            return filter_voters(filters).count()
+        return self.cache.get_or_compute('count', filters, compute)
+
+    def test_equivalent_filters_share_an_entry(self):
+        first = self.count('party_affiliation=Democrat&elections=v20state&elections=v21town&min_dob=1950')
+        second = self.count('elections=v21town&elections=v20state&party_affiliation=democrat&min_dob=01950')
+        self.assertEqual(first, second)
+        self.assertEqual(self.computed, 1)
+        self.assertEqual(self.cache.stats()['hits'], 1)
+
+    def test_load_drops_cached_results(self):
+        self.assertEqual(self.count(''), 100)
+        self.assertEqual(self.count(''), 100)
+        self.assertEqual(self.computed, 1)
+
+        quiet_load(self.write_roll('bigger.csv', 130, seed=12))
+        self.assertEqual(self.count(''), 130)
+        self.assertEqual(self.computed, 2)
+        self.assertEqual(self.cache.stats()['data_version'], DataVersion.current())
+
+    def test_load_changing_nothing_keeps_cached_results(self):
+        self.count('')
+        quiet_load(self.base, incremental=True)
+        self.count('')
+        self.assertEqual(self.computed, 1)
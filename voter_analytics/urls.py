@@ -3,6 +3,13 @@ from . import views
 
 urlpatterns = [
     path('', views.VotersListView.as_view(), name='voters'),  # 首页显示Voter列表
+    path('export/', views.ExportVotersView.as_view(), name='export_voters'),  # 导出筛选后的Voter(CSV/JSON lines)
     path('voter/<int:pk>/', views.VoterDetailView.as_view(), name='voter_detail'),  # Voter详细页
+    path('household/<str:key>/', views.HouseholdDetailView.as_view(), name='household_detail'),  # 同一地址的住户
+    path('precincts/', views.PrecinctView.as_view(), name='precincts'),  # 各选区统计与对比
     path('graphs/', views.GraphsView.as_view(), name='graphs'),  # 图表页面
+    path('charts/<slug:name>/', views.ChartDataView.as_view(), name='chart_data'),  # 单个图表的数据(JSON)
+    path('compare/', views.CompareView.as_view(), name='compare'),  # 多组选民对比
+    path('compare/charts/<slug:name>/', views.CompareChartView.as_view(), name='compare_chart_data'),  # 对比图表的数据(JSON)
+    path('cache-stats/', views.CacheStatsView.as_view(), name='cache_stats'),  # 缓存命中统计
 ]
\ No newline at end of file
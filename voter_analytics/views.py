@@ -1,20 +1,33 @@
 # voter_analytics/views.py
 
+from django.http import Http404, HttpResponse, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.views import View
 from django.views.generic import ListView, DetailView, TemplateView
-from .models import Voter
-from .forms import FilterForm
-import datetime
-import plotly
-import plotly.graph_objs as go
-from collections import defaultdict  # Needed for Graph 2
+from .models import Household, Voter
+from .forms import FilterForm, SearchForm
+from .analytics import (
+    ELECTIONS, ELECTION_LABELS, MAX_COHORTS, cohort_prefix, describe_filters, filter_voters, parse_cohorts,
+    parse_filters, precinct_summaries,
+)
+from .cache import result_cache
+from .charts import (
+    CHARTS, COMPARE_CHARTS, chart_etag, chart_json, compare_aggregates, compare_etag, compare_json,
+    prepare_comparison, prepare_graphs,
+)
+from .export import EXPORT_FORMATS, stream_csv, stream_jsonl
+from .pagination import CountedPaginator, KeysetPage, VoterIdResults, cached_voter_count, keyset_page
+from .search import search_voter_ids, search_voters
+from .snapshot import get_snapshot
 
 class VotersListView(ListView):
     """
     View to display a list of Voter records with pagination and filtering.
     """
     model = Voter
-    template_name = 'voter_analytics/voters_list.html'
+    template_name = 'voter_analytics/voter_list.html'
     context_object_name = 'results'
     paginate_by = 100  # Display 100 records per page
 
@@ -22,50 +35,112 @@ class VotersListView(ListView):
         """
         Override the default queryset to apply filters based on GET parameters.
         """
-        qs = super().get_queryset().order_by('last_name', 'first_name')
+        self.filters = parse_filters(self.request.GET)
 
-        # Get filter parameters
-        party = self.request.GET.get('party_affiliation')
-        min_dob = self.request.GET.get('min_dob')
-        max_dob = self.request.GET.get('max_dob')
-        voter_score = self.request.GET.get('voter_score')
-        elections = self.request.GET.getlist('elections')  # Get multiple options
+        # A search lists its matches best first instead of in name order
+        search = self.request.GET.get('q', '').strip()
+        if search:
+            return VoterIdResults(search_voter_ids(search, self.filters))
 
-        # Filtering logic
-        if party and party != 'All':
-            qs = qs.filter(party_affiliation__iexact=party.strip())
+        snapshot = get_snapshot()
+        if snapshot is not None:
+            return snapshot.matching_voters(self.filters)
 
-        if min_dob:
-            try:
-                qs = qs.filter(date_of_birth__year__gte=int(min_dob))
-            except ValueError:
-                pass  # Ignore format errors
+        qs = super().get_queryset().order_by('last_name', 'first_name', 'id')
+        return filter_voters(self.filters, qs)
 
-        if max_dob:
-            try:
-                qs = qs.filter(date_of_birth__year__lte=int(max_dob))
-            except ValueError:
-                pass  # Ignore format errors
+    def paginate_queryset(self, queryset, page_size):
+        """
+        Page through database results by seeking from a cursor (?after= or
+        ?before=), so deep pages cost the same as the first one. Old ?page=N
+        links, and snapshot and search results, which slice in constant time
+        anyway, keep using offsets.
+        """
+        if isinstance(queryset, VoterIdResults) or self.request.GET.get('page'):
+            return super().paginate_queryset(queryset, page_size)
 
-        if voter_score and voter_score != 'All':
-            qs = qs.filter(voter_score=voter_score)
+        page = keyset_page(
+            queryset,
+            after=self.request.GET.get('after'),
+            before=self.request.GET.get('before'),
+            per_page=page_size,
+            count=cached_voter_count(self.filters, queryset),
+        )
+        return (page.paginator, page, page.object_list, page.paginator.num_pages > 1)
 
-        if elections:
-            for election in elections:
-                if election in ['v20state', 'v21town', 'v21primary', 'v22general', 'v23town']:
-                    filter_kwargs = {election: True}
-                    qs = qs.filter(**filter_kwargs)
+    def get_paginator(self, queryset, per_page, orphans=0, allow_empty_first_page=True, **kwargs):
+        """
+        Reuse the cached count for offset pages too.
+        """
+        if isinstance(queryset, VoterIdResults):
+            return super().get_paginator(queryset, per_page, orphans, allow_empty_first_page, **kwargs)
+        return CountedPaginator(
+            queryset, per_page, cached_voter_count(self.filters, queryset),
+            orphans=orphans, allow_empty_first_page=allow_empty_first_page, **kwargs,
+        )
 
-        return qs
+    def page_url(self, **params):
+        """
+        Link to another page of the current results, keeping the filters.
+        """
+        query = self.request.GET.copy()
+        for name in ('page', 'after', 'before'):
+            query.pop(name, None)
+        query.update(params)
+        return '?' + query.urlencode()
 
     def get_context_data(self, **kwargs):
         """
-        Add the filter form to the context.
+        Add the filter form and the previous/next page links to the context.
         """
         context = super().get_context_data(**kwargs)
         context['filter_form'] = FilterForm(self.request.GET)
+        context['search_form'] = SearchForm(self.request.GET)
+        context['export_csv_url'] = reverse('export_voters') + self.page_url(format='csv')
+        context['export_jsonl_url'] = reverse('export_voters') + self.page_url(format='jsonl')
+
+        page = context['page_obj']
+        context['previous_url'] = context['next_url'] = None
+        if isinstance(page, KeysetPage):
+            if page.previous_cursor:
+                context['previous_url'] = self.page_url(before=page.previous_cursor)
+            if page.next_cursor:
+                context['next_url'] = self.page_url(after=page.next_cursor)
+        elif page is not None:
+            if page.has_previous():
+                context['previous_url'] = self.page_url(page=page.previous_page_number())
+            if page.has_next():
+                context['next_url'] = self.page_url(page=page.next_page_number())
         return context
 
+class ExportVotersView(View):
+    """
+    Download every voter matching the FilterForm parameters (and search, if
+    any), as CSV (?format=csv, the default) or JSON lines (?format=jsonl).
+
+    The response is streamed while the voters are read in chunks, so large
+    exports neither time out before the first byte nor build up in memory.
+    """
+
+    def get(self, request):
+        export_format = request.GET.get('format', 'csv')
+        if export_format not in EXPORT_FORMATS:
+            return HttpResponseBadRequest(f'Unknown export format {export_format!r}')
+
+        filters = parse_filters(request.GET)
+        search = request.GET.get('q', '').strip()
+        if search:
+            # Every match, not just the SEARCH_LIMIT the voter list shows
+            qs = search_voters(search, filters).order_by('id')
+        else:
+            qs = filter_voters(filters, Voter.objects.order_by('id'))
+        content_type, extension = EXPORT_FORMATS[export_format]
+        rows = stream_csv(qs) if export_format == 'csv' else stream_jsonl(qs)
+
+        response = StreamingHttpResponse(rows, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="voters.{extension}"'
+        return response
+
 class VoterDetailView(DetailView):
     """
     View to display details of a single Voter.
@@ -74,146 +149,228 @@ class VoterDetailView(DetailView):
     template_name = 'voter_analytics/voter_detail.html'
     context_object_name = 'r'
 
+    def get_context_data(self, **kwargs):
+        """
+        Add the voter's household and the other voters in it.
+        """
+        context = super().get_context_data(**kwargs)
+        voter = self.object
+        context['household'] = Household.objects.filter(key=voter.household_key).first()
+        context['household_members'] = voter.household_members()
+        return context
+
+class HouseholdDetailView(DetailView):
+    """
+    View to display one household: its size, party mix and turnout, and the
+    voters in it.
+    """
+    model = Household
+    template_name = 'voter_analytics/household_detail.html'
+    context_object_name = 'household'
+    slug_field = 'key'
+    slug_url_kwarg = 'key'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['members'] = (
+            Voter.objects.filter(household_key=self.object.key).order_by('last_name', 'first_name', 'id')
+        )
+        return context
+
+class PrecinctView(TemplateView):
+    """
+    View to display voter counts, party mix and turnout for every precinct,
+    and to compare the precincts picked with ?precinct= side by side.
+
+    The numbers come from the precinct rollup and are cached until the next
+    load, so picking another set of precincts reads no voters.
+    """
+    template_name = 'voter_analytics/precincts.html'
+
+    def get_context_data(self, **kwargs):
+        """
+        Add the overview rows and, if precincts were picked, the comparison
+        table rows to the context.
+        """
+        context = super().get_context_data(**kwargs)
+        summaries = result_cache.get_or_compute('precincts', {}, precinct_summaries)
+        picked = set(self.request.GET.getlist('precinct'))
+        selected = [precinct for precinct in summaries if precinct in picked]
+
+        context['election_labels'] = [ELECTION_LABELS[election] for election in ELECTIONS]
+        context['precincts'] = [
+            {
+                'number': precinct,
+                'voters': summary['voters'],
+                'largest_party': next(iter(summary['parties'].items()), None),
+                'turnout': [summary['turnout'][election] for election in ELECTIONS],
+                'selected': precinct in picked,
+            }
+            for precinct, summary in summaries.items()
+        ]
+
+        compared = [summaries[precinct] for precinct in selected]
+        # Parties in any compared precinct, largest across all of them first
+        party_totals = {}
+        for summary in compared:
+            for party, voters in summary['parties'].items():
+                party_totals[party] = party_totals.get(party, 0) + voters
+        context['selected'] = selected
+        context['compared_voters'] = [summary['voters'] for summary in compared]
+        context['party_rows'] = [
+            (party, [
+                (summary['parties'].get(party, 0), summary['parties'].get(party, 0) / summary['voters'])
+                for summary in compared
+            ])
+            for party in sorted(party_totals, key=party_totals.get, reverse=True)
+        ]
+        context['turnout_rows'] = [
+            (ELECTION_LABELS[election], [summary['turnout'][election] for summary in compared])
+            for election in ELECTIONS
+        ]
+        return context
+
 class GraphsView(TemplateView):
     """
     View to display graphs of Voter data with filtering.
+
+    The page itself is only the filter form and one placeholder per graph;
+    each graph is fetched from ChartDataView with the same filters when it
+    scrolls into view. Rendering the page starts computing all the graphs
+    in the background, side by side, so they are usually ready by then.
     """
     template_name = 'voter_analytics/graphs.html'
 
     def get_context_data(self, **kwargs):
         """
-        Add graphs and filter form to the context.
+        Add the filter form and the chart data URLs to the context.
         """
         context = super().get_context_data(**kwargs)
         form = FilterForm(self.request.GET)
         context['filter_form'] = form
 
-        # Get filter parameters
-        qs = Voter.objects.all()
-        party = self.request.GET.get('party_affiliation')
-        min_dob = self.request.GET.get('min_dob')
-        max_dob = self.request.GET.get('max_dob')
-        voter_score = self.request.GET.get('voter_score')
-        elections = self.request.GET.getlist('elections')
-
-        # Filtering logic
-        if party and party != 'All':
-            qs = qs.filter(party_affiliation__iexact=party.strip())
-
-        if min_dob:
-            try:
-                qs = qs.filter(date_of_birth__year__gte=int(min_dob))
-            except ValueError:
-                pass  # Ignore format errors
-
-        if max_dob:
-            try:
-                qs = qs.filter(date_of_birth__year__lte=int(max_dob))
-            except ValueError:
-                pass  # Ignore format errors
-
-        if voter_score and voter_score != 'All':
-            qs = qs.filter(voter_score=voter_score)
-
-        if elections:
-            for election in elections:
-                if election in ['v20state', 'v21town', 'v21primary', 'v22general', 'v23town']:
-                    filter_kwargs = {election: True}
-                    qs = qs.filter(**filter_kwargs)
-
-        # Graph 1: Distribution of Voters by Year of Birth (Histogram)
-        birth_years = qs.values_list('date_of_birth__year', flat=True)
-        birth_year_counts = {}
-        for year in birth_years:
-            birth_year_counts[year] = birth_year_counts.get(year, 0) + 1
-        sorted_years = sorted(birth_year_counts.keys())
-        sorted_counts = [birth_year_counts[year] for year in sorted_years]
-
-        hist_trace = go.Bar(x=sorted_years, y=sorted_counts)
-        hist_layout = go.Layout(
-            title='Distribution of Voters by Year of Birth',
-            xaxis=dict(title='Year of Birth'),
-            yaxis=dict(title='Number of Voters')
-        )
-        hist_fig = go.Figure(data=[hist_trace], layout=hist_layout)
-        graph_div_birth = plotly.offline.plot(hist_fig, auto_open=False, output_type='div')
-        context['graph_div_birth'] = graph_div_birth
-
-        # Graph 2: Distribution of Voters by Party Affiliation (Pie Chart)
-        party_affiliations = qs.values_list('party_affiliation', flat=True)
-        party_counts = defaultdict(int)
-        for party_affiliation in party_affiliations:
-            party = party_affiliation.strip()
-            party_counts[party] += 1
-
-        total_voters = sum(party_counts.values())
-        threshold = 0.02  # Parties with less than 2% will be grouped into 'Other'
-        other_count = 0
-        filtered_party_counts = {}
-
-        for party, count in party_counts.items():
-            percentage = count / total_voters
-            if percentage < threshold:
-                other_count += count
-            else:
-                filtered_party_counts[party] = count
-
-        if other_count > 0:
-            filtered_party_counts['其他'] = other_count  # 合并为“其他”
-
-        # Sorting labels and values
-        sorted_items = sorted(filtered_party_counts.items(), key=lambda x: x[1], reverse=True)
-        if sorted_items:
-            labels, values = zip(*sorted_items)
-        else:
-            labels, values = [], []
-
-        pie_trace = go.Pie(
-            labels=labels,
-            values=values,
-            hoverinfo='label+percent+value',
-            textinfo='percent+label',
-            insidetextorientation='radial'
-        )
-        pie_layout = go.Layout(
-            title='Distribution of Voters by Party Affiliation',
-            width=800,
-            height=600,
-            legend=dict(
-                x=1,
-                y=0.5,
-                xanchor='left',
-                yanchor='middle'
-            ),
-            margin=dict(l=50, r=150, t=50, b=50),
-        )
-        pie_fig = go.Figure(data=[pie_trace], layout=pie_layout)
-        graph_div_party = plotly.offline.plot(pie_fig, auto_open=False, output_type='div')
-        context['graph_div_party'] = graph_div_party
-
-        # Graph 3: Participation in Past Elections (Bar Chart)
-        elections_list = ['v20state', 'v21town', 'v21primary', 'v22general', 'v23town']
-        election_counts = {}
-        for election in elections_list:
-            count = qs.filter(**{election: True}).count()
-            election_counts[election] = count
-        bar_x = [
-            '2020 State Election' if e == 'v20state' else
-            '2021 Town Election' if e == 'v21town' else
-            '2021 Primary Election' if e == 'v21primary' else
-            '2022 General Election' if e == 'v22general' else
-            '2023 Town Election' for e in elections_list
+        query = f'?{self.request.GET.urlencode()}' if self.request.GET else ''
+        context['chart_urls'] = [
+            reverse('chart_data', args=[name]) + query for name in CHARTS
         ]
-        bar_y = [election_counts[election] for election in elections_list]
+        return context
 
-        bar_trace = go.Bar(x=bar_x, y=bar_y)
-        bar_layout = go.Layout(
-            title='Participation in Past Elections',
-            xaxis=dict(title='Election'),
-            yaxis=dict(title='Number of Voters')
-        )
-        bar_fig = go.Figure(data=[bar_trace], layout=bar_layout)
-        graph_div_elections = plotly.offline.plot(bar_fig, auto_open=False, output_type='div')
-        context['graph_div_elections'] = graph_div_elections
+    def render_to_response(self, context, **response_kwargs):
+        """
+        Start the graphs once the page is rendered, so they don't slow it down.
+        """
+        response = super().render_to_response(context, **response_kwargs)
+        filters = parse_filters(self.request.GET)
+        response.add_post_render_callback(lambda response: prepare_graphs(filters))
+        return response
+
+class ChartDataView(View):
+    """
+    Plotly figure JSON for one graph, filtered with the FilterForm parameters.
+
+    The ETag depends only on the data version and the normalized filters, so
+    a browser revalidating an unchanged chart gets a 304 without the chart
+    being built.
+    """
+
+    charts = CHARTS
+
+    def parse(self, params):
+        return parse_filters(params)
+
+    def etag(self, name, filters):
+        return chart_etag(name, filters)
+
+    def chart_json(self, name, filters):
+        return chart_json(name, filters)
+
+    def get(self, request, name):
+        if name not in self.charts:
+            raise Http404(f'No chart named {name!r}')
+
+        filters = self.parse(request.GET)
+        etag = self.etag(name, filters)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = HttpResponse(self.chart_json(name, filters), content_type='application/json')
+        response.headers['ETag'] = etag
+        patch_cache_control(response, no_cache=True)
+        return response
+
+class CompareView(TemplateView):
+    """
+    View to compare up to MAX_COHORTS cohorts of voters, each picked with its
+    own FilterForm, on one page: their sizes and turnout rates, and each
+    graph with one trace per cohort.
+
+    All cohorts are computed together in a single grouped query (see
+    analytics.cohort_aggregates), so adding a cohort does not add a scan.
+    """
+    template_name = 'voter_analytics/compare.html'
 
+    def get_context_data(self, **kwargs):
+        """
+        Add one filter form per cohort, the cohort summaries and the chart
+        data URLs to the context.
+        """
+        context = super().get_context_data(**kwargs)
+        cohorts = parse_cohorts(self.request.GET)
+        results = compare_aggregates(cohorts)
+
+        context['cohorts'] = [
+            {
+                'form': FilterForm(self.request.GET, prefix=cohort_prefix(index)),
+                'label': describe_filters(filters),
+                'voters': aggregates['voters'],
+                'turnout': [aggregates['turnout'][election] for election in ELECTIONS],
+            }
+            for index, (filters, aggregates) in enumerate(zip(cohorts, results))
+        ]
+        context['election_labels'] = [ELECTION_LABELS[election] for election in ELECTIONS]
+
+        # Links with one cohort more or less, keeping the others' filters
+        context['add_cohort_url'] = context['remove_cohort_url'] = None
+        for name, count in (('add_cohort_url', len(cohorts) + 1), ('remove_cohort_url', len(cohorts) - 1)):
+            if 1 <= count <= MAX_COHORTS:
+                query = self.request.GET.copy()
+                query['cohorts'] = count
+                context[name] = '?' + query.urlencode()
+
+        query = f'?{self.request.GET.urlencode()}' if self.request.GET else ''
+        context['chart_urls'] = [
+            reverse('compare_chart_data', args=[name]) + query for name in COMPARE_CHARTS
+        ]
         return context
+
+    def render_to_response(self, context, **response_kwargs):
+        """
+        Start the graphs once the page is rendered, as GraphsView does.
+        """
+        response = super().render_to_response(context, **response_kwargs)
+        cohorts = parse_cohorts(self.request.GET)
+        response.add_post_render_callback(lambda response: prepare_comparison(cohorts))
+        return response
+
+class CompareChartView(ChartDataView):
+    """
+    Plotly figure JSON for one comparison graph, for the cohorts in the
+    CompareView parameters.
+    """
+    charts = COMPARE_CHARTS
+
+    def parse(self, params):
+        return parse_cohorts(params)
+
+    def etag(self, name, cohorts):
+        return compare_etag(name, cohorts)
+
+    def chart_json(self, name, cohorts):
+        return compare_json(name, cohorts)
+
+class CacheStatsView(View):
+    """
+    Hit/miss counters of this worker's filter result cache, for monitoring.
+    """
+
+    def get(self, request):
+        return JsonResponse(result_cache.stats())